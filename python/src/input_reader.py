@@ -1,7 +1,19 @@
-from typing import Union, Iterable, Tuple, List, Dict, Set
+from __future__ import annotations
 
+from typing import TYPE_CHECKING, Union, Iterable, Tuple, List, Dict, Set
+
+import os
 import re
+import sys
+import hashlib
+import inspect
+import marshal
 import pathlib
+import functools
+
+if TYPE_CHECKING:
+    # imported where it is used, days without arrays do not load NumPy
+    import numpy as np
 
 
 class TestInput:
@@ -14,12 +26,98 @@ Coord2D = Tuple[int, int]
 Coord3D = Tuple[int, int, int]
 
 
+# map files this large are memory-mapped instead of read
+GRID_MEMMAP_SIZE = 1 << 20
+
+
+CACHE_DIRECTORY = pathlib.Path(__file__).parent.parent / '.cache' / 'inputs'
+
+
+# (reader name, filename) -> (file modification time, result)
+_cache = {}
+
+
+def _input_path(filename : str) -> pathlib.Path:
+    return pathlib.Path(__file__).parent.parent.parent / 'data' / filename
+
+
+def _cached(reader):
+    """Keep the reader's result per file until the file is modified.
+
+    The result is shared by all callers, so the reader must return
+    immutable values. TestInputs are always read again.
+    """
+    @functools.wraps(reader)
+    def cached_reader(filename : FilenameOrTestInput):
+        if isinstance(filename, TestInput):
+            return reader(filename)
+        mtime = _input_path(filename).stat().st_mtime_ns
+        key = reader.__name__, filename
+        if key not in _cache or _cache[key][0] != mtime:
+            _cache[key] = mtime, reader(filename)
+        return _cache[key][1]
+    return cached_reader
+
+
+def cached_on_disk(function):
+    """Store results of a function of an input file in the cache directory.
+
+    The function takes the input filename and any other arguments with a
+    stable repr, and returns data which marshal supports (numbers, strings,
+    bytes, tuples, lists, sets and dicts). The result is valid for a hash of
+    the input file, the sources of all modules next to the function's one
+    (as it may use any of them) and the Python version, so editing either
+    the input or the code invalidates it. Only the latest result is kept for
+    each input and arguments, older ones are deleted. TestInputs are never
+    cached.
+    """
+    directory = pathlib.Path(inspect.getsourcefile(function)).parent
+    source = hashlib.sha256()
+    for path in sorted(directory.glob('*.py')):
+        source.update(path.name.encode())
+        source.update(hashlib.sha256(path.read_bytes()).digest())
+    source = source.digest()
+
+    def digest(*parts):
+        rtn = hashlib.sha256()
+        for part in parts:
+            rtn.update(hashlib.sha256(part).digest())
+        return rtn.hexdigest()[:16]
+
+    @functools.wraps(function)
+    def cached_function(filename : FilenameOrTestInput, *args):
+        if isinstance(filename, TestInput):
+            return function(filename, *args)
+        # file names are {function}-{input and arguments}-{version}.marshal
+        name = f'{function.__qualname__}-' + digest(
+            function.__module__.encode(), filename.encode(),
+            repr(args).encode())
+        version = digest(_input_path(filename).read_bytes(), source,
+                         sys.implementation.cache_tag.encode())
+        path = CACHE_DIRECTORY / f'{name}-{version}.marshal'
+        try:
+            return marshal.loads(path.read_bytes())
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+
+        rtn = function(filename, *args)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp_path.write_bytes(marshal.dumps(rtn))
+        os.replace(tmp_path, path)
+        for old_path in CACHE_DIRECTORY.glob(f'{name}-*.marshal'):
+            if old_path != path:
+                old_path.unlink(missing_ok=True)
+        return rtn
+    return cached_function
+
+
 def read_lines(filename : FilenameOrTestInput) -> Iterable[str]:
     if isinstance(filename, TestInput):
         yield from filename.contents.splitlines()
         return
 
-    path = pathlib.Path(__file__).parent.parent.parent / 'data' / filename
+    path = _input_path(filename)
     with path.open('rt') as f:
         for line in f:
             yield line.strip('\n')
@@ -29,8 +127,9 @@ def read_one_line(filename : FilenameOrTestInput) -> str:
     return next(read_lines(filename))
 
 
-def read_comma_separated_integers(filename : FilenameOrTestInput) -> Iterable[int]:
-    return [int(x) for x in read_one_line(filename).split(',')]
+@_cached
+def read_comma_separated_integers(filename : FilenameOrTestInput) -> Tuple[int, ...]:
+    return tuple(int(x) for x in read_one_line(filename).split(','))
 
 
 def read_orbits(filename : FilenameOrTestInput) -> Iterable[Tuple[str, str]]:
@@ -38,10 +137,13 @@ def read_orbits(filename : FilenameOrTestInput) -> Iterable[Tuple[str, str]]:
         yield line.split(')')
 
 
-def _read_direction_line(line : str) -> Iterable[str]:
+def _read_segment_line(line : str) -> Iterable[Tuple[str, int]]:
     for segment in line.split(','):
-        direction = segment[0]
-        counter = int(segment[1:])
+        yield segment[0], int(segment[1:])
+
+
+def _read_direction_line(line : str) -> Iterable[str]:
+    for direction, counter in _read_segment_line(line):
         for _i in range(counter):
             yield direction
 
@@ -51,11 +153,106 @@ def read_directions_per_line(filename : FilenameOrTestInput) -> Iterable[List[st
         yield list(_read_direction_line(line))
 
 
+def read_segments_per_line(filename : FilenameOrTestInput
+                           ) -> Iterable[Iterable[Tuple[str, int]]]:
+    """Yield (direction, length) runs of each line, like ('R', 1003)."""
+    for line in read_lines(filename):
+        yield _read_segment_line(line)
+
+
+def _read_bytes(filename : FilenameOrTestInput) -> np.ndarray:
+    """Return the input as a uint8 array, memory-mapped if it is large."""
+    import numpy as np
+
+    if isinstance(filename, TestInput):
+        return np.frombuffer(filename.contents.encode(), dtype=np.uint8)
+    path = _input_path(filename)
+    if path.stat().st_size >= GRID_MEMMAP_SIZE:
+        return np.memmap(path, dtype=np.uint8, mode='r')
+    return np.fromfile(path, dtype=np.uint8)
+
+
+def read_integer_array(filename : FilenameOrTestInput) -> np.ndarray:
+    """Read comma separated integers into an int64 array.
+
+    ValueError is raised for values which are not integers or do not fit
+    in 64 bits.
+    """
+    import numpy as np
+
+    if isinstance(filename, TestInput):
+        rtn = np.fromstring(filename.contents, dtype=np.int64, sep=',')
+    else:
+        rtn = np.fromfile(_input_path(filename), dtype=np.int64, sep=',')
+
+    # NumPy clamps values which are too large, so these are parsed again
+    limits = np.iinfo(np.int64)
+    suspects = np.flatnonzero((rtn == limits.max) | (rtn == limits.min))
+    if len(suspects):
+        tokens = read_one_line(filename).split(',')
+        for i in suspects.tolist():
+            if int(tokens[i]) != rtn[i]:
+                raise ValueError(f'Value does not fit in 64 bits: {tokens[i]}')
+    return rtn
+
+
+def read_grid(filename : FilenameOrTestInput) -> np.ndarray:
+    """Read a map of characters into a 2D uint8 array, indexed [y, x].
+
+    Lines shorter than the longest one are padded with spaces, and both
+    '\n' and '\r\n' line ends are accepted. Large files with lines of equal
+    length which end with a newline are memory-mapped.
+    """
+    import numpy as np
+
+    data = _read_bytes(filename)
+    if not len(data):
+        return np.zeros((0, 0), dtype=np.uint8)
+
+    newlines = np.flatnonzero(data == ord('\n'))
+    ends_with_newline = len(newlines) and newlines[-1] == len(data) - 1
+    if not ends_with_newline:
+        newlines = np.append(newlines, len(data))
+    starts = np.concatenate(([0], newlines[:-1] + 1))
+    widths = newlines - starts
+    # the '\r' of a '\r\n' line end is not part of the map
+    carriage_returns = (widths > 0) & (
+        data[np.maximum(newlines - 1, 0)] == ord('\r'))
+    widths = widths - carriage_returns
+    height = len(widths)
+    if (ends_with_newline and len(set(widths)) == 1
+            and len(set(carriage_returns)) == 1):
+        # a view of the file, without the line ends
+        return data.reshape(height, -1)[:, :widths[0]]
+
+    rtn = np.full((height, widths.max()), ord(' '), dtype=np.uint8)
+    for y, (start, width) in enumerate(zip(starts, widths)):
+        rtn[y, :width] = data[start : start + width]
+    return rtn
+
+
+def grid_coordinates(grid : np.ndarray, characters : str) -> np.ndarray:
+    """Return an array of (x, y) rows where grid has one of the characters.
+
+    Coordinates are ordered by rows, like reading the map.
+    """
+    import numpy as np
+
+    codes = np.frombuffer(characters.encode(), dtype=np.uint8)
+    ys, xs = np.nonzero(np.isin(grid, codes))
+    return np.column_stack((xs, ys))
+
+
+def grid_characters(grid : np.ndarray, characters : str) -> Dict[Coord2D, str]:
+    """Return a dict of coordinates to characters, for the given ones only."""
+    return {
+        (int(x), int(y)): chr(grid[y, x])
+        for x, y in grid_coordinates(grid, characters)}
+
+
 def read_asteroid_map(filename : FilenameOrTestInput) -> Iterable[Coord2D]:
-    for y, line in enumerate(read_lines(filename)):
-        for x, ch in enumerate(line):
-            if ch == '#':
-                yield (x, y)
+    for x, y in grid_coordinates(read_grid(filename), '#').tolist():
+        yield (x, y)
 
 
 def read_moons(filename : FilenameOrTestInput) -> Iterable[Coord3D]:
@@ -65,15 +262,21 @@ def read_moons(filename : FilenameOrTestInput) -> Iterable[Coord3D]:
         yield int(m.group('x')), int(m.group('y')), int(m.group('z'))
 
 
+@_cached
 def read_nanofactory_specs(filename : FilenameOrTestInput
-                           ) -> Iterable[Tuple[List[Tuple[int, str]], Tuple[int, str]]]:
+                           ) -> Tuple[Tuple[Tuple[Tuple[int, str], ...], Tuple[int, str]], ...]:
+    return tuple(_read_nanofactory_specs(filename))
+
+
+def _read_nanofactory_specs(filename : FilenameOrTestInput
+                            ) -> Iterable[Tuple[Tuple[Tuple[int, str], ...], Tuple[int, str]]]:
     for line in read_lines(filename):
         # 7 A, 1 D => 1 E
         arrow = line.find('=>')
         inputs = [input.split()
             for input in line[:arrow].split(',')]
         out_amount, out_name = line[arrow + len('=>'):].split()
-        converted_in = [(int(amount), name) for amount, name in inputs]
+        converted_in = tuple((int(amount), name) for amount, name in inputs)
         converted_out = int(out_amount), out_name
         yield converted_in, converted_out
 
@@ -89,10 +292,7 @@ def read_labyrinth(filename : FilenameOrTestInput) -> Dict[Coord2D, str]:
 
 
 def read_bugs_coordinates(filename : FilenameOrTestInput) -> Set[Coord2D]:
-    return set(
-        (x, y)
-        for (x, y), value in read_labyrinth(filename).items()
-        if value == '#')
+    return set(map(tuple, grid_coordinates(read_grid(filename), '#').tolist()))
 
 
 def read_digits(filename : FilenameOrTestInput) -> Iterable[int]:
@@ -100,6 +300,22 @@ def read_digits(filename : FilenameOrTestInput) -> Iterable[int]:
     return (int(x) for x in line)
 
 
+def read_digit_array(filename : FilenameOrTestInput) -> np.ndarray:
+    """Read the first line of digits into a uint8 array of their values."""
+    import numpy as np
+
+    data = _read_bytes(filename)
+    newlines = np.flatnonzero(data == ord('\n'))
+    if len(newlines):
+        data = data[:newlines[0]]
+    if len(data) and data[-1] == ord('\r'):
+        data = data[:-1]
+    # other characters wrap around to values above 9
+    digits = data - np.uint8(ord('0'))
+    assert (digits <= 9).all(), f'bad input: {filename}'
+    return digits
+
+
 def read_shuffle_algorithm(filename: FilenameOrTestInput):
     for line in read_lines(filename):
         if line == 'deal into new stack':
@@ -1,26 +1,148 @@
+from array import array
 from enum import Enum
-from threading import Thread
-from queue import Queue
+from functools import partial
+from itertools import repeat
+from operator import length_hint
+from copy import copy
+from collections import Counter
+from time import perf_counter
+import json
+import marshal
+import pathlib
+import sys
+import zlib
+
+
+_PAGE_BITS = 10
+_PAGE_SIZE = 1 << _PAGE_BITS
+_OFFSET_MASK = _PAGE_SIZE - 1
+
+
+# bump when the snapshot format changes
+_SNAPSHOT_VERSION = 3
+
+# marshal data is only readable by the same Python version
+_SNAPSHOT_HEADER = (
+    f'intcode snapshot {_SNAPSHOT_VERSION} {sys.implementation.cache_tag}\n'
+    .encode())
+
+
+def _pack_snapshot(value):
+    return _SNAPSHOT_HEADER + zlib.compress(marshal.dumps(value))
+
+
+def _unpack_snapshot(data):
+    if not data.startswith(_SNAPSHOT_HEADER):
+        header = data.partition(b'\n')[0][:80]
+        raise IntcodeError(f"Unsupported snapshot {header!r}")
+    return marshal.loads(zlib.decompress(data[len(_SNAPSHOT_HEADER):]))
+
+
+def _zero_page():
+    return array('q', bytes(8 * _PAGE_SIZE))
 
 
 class InfiniteMemory:
+    """Zero-initialized Intcode memory which grows on demand.
+
+    Cells are kept in pages of 64-bit integer arrays. A page is replaced with
+    a list of Python integers once a value in it does not fit. Copies share
+    all pages until one side writes to them.
+
+    Writes to addresses in `watched` are reported to `on_watched_write`.
+    """
     def __init__(self, data):
-        self.data = dict(enumerate(data))
+        self.watched = set()
+        self.on_watched_write = None
+        # page number -> page, pages which were never written are missing
+        self._pages = {}
+        data = list(data)
+        for start in range(0, len(data), _PAGE_SIZE):
+            values = data[start : start + _PAGE_SIZE]
+            values += [0] * (_PAGE_SIZE - len(values))
+            try:
+                self._pages[start >> _PAGE_BITS] = array('q', values)
+            except OverflowError:
+                self._pages[start >> _PAGE_BITS] = values
+        # page numbers of the pages not shared with a copy
+        self._owned = set(self._pages)
+
+    def copy(self):
+        rtn = InfiniteMemory([])
+        rtn._pages = self._pages.copy()
+        self._owned = set()
+        return rtn
 
     def __getitem__(self, index):
-        index = int(index)
-        assert index >= 0
-        return self.data.get(index, 0)
+        if index < 0:
+            raise IndexError(f'Negative memory address {index}')
+        try:
+            return self._pages[index >> _PAGE_BITS][index & _OFFSET_MASK]
+        except KeyError:
+            return 0
 
     def __setitem__(self, index, value):
-        index = int(index)
-        value = int(value)
-        assert index >= 0
-        self.data[index] = value
+        if index < 0:
+            raise IndexError(f'Negative memory address {index}')
+        pages = self._pages
+        page = index >> _PAGE_BITS
+        if page not in self._owned:
+            shared = pages.get(page)
+            pages[page] = _zero_page() if shared is None else shared[:]
+            self._owned.add(page)
+        try:
+            pages[page][index & _OFFSET_MASK] = value
+        except OverflowError:
+            pages[page] = list(pages[page])
+            pages[page][index & _OFFSET_MASK] = value
+        if index in self.watched:
+            self.on_watched_write(index)
+
+    def _contiguous_cells(self):
+        """Return the cells of the pages from address 0 up to a missing one."""
+        rtn = []
+        page = 0
+        while page in self._pages:
+            rtn.extend(self._pages[page])
+            page += 1
+        return rtn
+
+    def _dump_pages(self):
+        """Pages as bytes (or tuples when not 64-bit), without zero pages."""
+        rtn = {}
+        for number, page in self._pages.items():
+            if isinstance(page, list):
+                rtn[number] = tuple(page)
+            elif any(page):
+                rtn[number] = page.tobytes()
+        return rtn
+
+    @classmethod
+    def _load_pages(cls, dumped_pages):
+        rtn = cls([])
+        for number, page in dumped_pages.items():
+            if isinstance(page, tuple):
+                rtn._pages[number] = list(page)
+            else:
+                rtn._pages[number] = array('q', page)
+        rtn._owned = set(rtn._pages)
+        return rtn
+
+    def _add_zero_pages(self, size):
+        """Create the missing pages of the addresses below size."""
+        for page in range(-(-size >> _PAGE_BITS)):
+            if page not in self._pages:
+                self._pages[page] = _zero_page()
+                self._owned.add(page)
 
     def __eq__(self, other):
-        if isinstance(other, InfiniteMemory):
-            return self.data == other.data
+        if not isinstance(other, InfiniteMemory):
+            return NotImplemented
+        zero_page = [0] * _PAGE_SIZE
+        return all(
+            list(self._pages.get(number, zero_page)) ==
+            list(other._pages.get(number, zero_page))
+            for number in self._pages.keys() | other._pages.keys())
 
 
 class _IntcodeState(Enum):
@@ -29,12 +151,119 @@ class _IntcodeState(Enum):
     WAITING_FOR_INPUT = 3
     INTERMEDIATE = 4
     FINISHED = 5
+    SUSPENDED = 6
 
 
 class IntcodeError(Exception):
     pass
 
 
+# number of parameters of each opcode
+_PARAMETER_COUNTS = {1: 3, 2: 3, 3: 1, 4: 1, 5: 2, 6: 2, 7: 3, 8: 3, 9: 1, 99: 0}
+
+# (opcode, parameter index) pairs which are written to, never in immediate mode
+_WRITE_PARAMETERS = {(1, 3), (2, 3), (3, 1), (7, 3), (8, 3)}
+
+
+def decode_instruction(ops, p):
+    """Decode the instruction at address p of ops.
+
+    Returns a tuple (op, next_p, mode1, arg1, mode2, arg2, mode3, arg3),
+    unused parameters are padded with zeros.
+    """
+    op_value = ops[p]
+    op = op_value % 100
+    if op not in _PARAMETER_COUNTS:
+        raise IntcodeError(f'Invalid opcode {op}')
+    parameter_count = _PARAMETER_COUNTS[op]
+    modes = op_value // 100
+    instruction = [op, p + parameter_count + 1]
+    for i in range(1, parameter_count + 1):
+        mode = modes % 10
+        modes //= 10
+        if mode not in (0, 1, 2):
+            raise IntcodeError(f'Invalid parameter mode {mode}')
+        if mode == 1 and (op, i) in _WRITE_PARAMETERS:
+            raise IntcodeError('Parameters written to cannot be immediate')
+        instruction += [mode, ops[p+i]]
+    instruction += [0, 0] * (3 - parameter_count)
+    return tuple(instruction)
+
+
+class IntcodeProfile:
+    """Execution statistics of an Intcode, see Intcode.enable_profiling."""
+    def __init__(self):
+        self.instructions = 0
+        self.opcode_counts = Counter()
+        self.address_counts = Counter()
+        self.instructions_between_io = []
+        self.elapsed_seconds = 0.0
+        self._instructions_at_last_io = 0
+        self._last_instruction = None
+
+    @property
+    def instructions_per_second(self):
+        if not self.elapsed_seconds:
+            return None
+        return self.instructions / self.elapsed_seconds
+
+    def hot_addresses(self, n=10):
+        return self.address_counts.most_common(n)
+
+    def as_dict(self):
+        stretches = self.instructions_between_io
+        return {
+            'instructions': self.instructions,
+            'elapsed_seconds': self.elapsed_seconds,
+            'instructions_per_second': self.instructions_per_second,
+            'opcode_counts': {str(op): count for op, count
+                              in sorted(self.opcode_counts.items())},
+            'hot_addresses': self.hot_addresses(),
+            'io_events': len(stretches),
+            'max_instructions_between_io': max(stretches, default=0),
+            'mean_instructions_between_io':
+                sum(stretches) / len(stretches) if stretches else None,
+        }
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), indent=2)
+
+    def _record_instruction(self, p, op):
+        self.instructions += 1
+        self.address_counts[p] += 1
+        self.opcode_counts[op] += 1
+        self._last_instruction = p, op
+
+    def _unrecord_instruction(self):
+        """Forget the last instruction, it is executed again on resume."""
+        p, op = self._last_instruction
+        self.instructions -= 1
+        self.address_counts[p] -= 1
+        self.opcode_counts[op] -= 1
+
+    def _record_io(self):
+        self.instructions_between_io.append(
+            self.instructions - self._instructions_at_last_io)
+        self._instructions_at_last_io = self.instructions
+
+
+class _ProfilingDecodeCache(dict):
+    """Decode cache which counts every instruction fetched from it."""
+    def __init__(self, data, memory, profile):
+        super().__init__(data)
+        self.memory = memory
+        self.profile = profile
+
+    def get(self, p):
+        instruction = super().get(p)
+        if instruction is None:
+            op = self.memory[p] % 100
+        else:
+            op = instruction[0]
+        self.profile._record_instruction(p, op)
+        return instruction
+
+
 class Intcode:
     """Intcode interpreter
 
@@ -46,11 +275,27 @@ class Intcode:
         while not ic.finished:
             print(ic.read_output())
 
+    or, without returning to the caller for every value:
+
+        outputs = []
+        ic = Intcode(code_bytes)
+        ic.run(deque([44]).popleft, outputs.append)
+
     """
     def __init__(self, opcodes):
         self.memory = InfiniteMemory(opcodes)
         self._state = _IntcodeState.NOT_STARTED
-        self._generator = None
+        self._p = 0
+        self._relative_base = 0
+        self._output = None
+        # address -> decoded instruction, see _decode
+        self._decoded = {}
+        # addresses covered by decoded instructions, writes there invalidate them
+        self._code_cells = set()
+        # both are shared with forks until either side changes them
+        self._decode_cache_owned = True
+        self._watch_code_cells()
+        self.profile = None
 
     @property
     def finished(self):
@@ -64,18 +309,20 @@ class Intcode:
     def requires_input(self):
         return self._state == _IntcodeState.WAITING_FOR_INPUT
 
+    @property
+    def suspended(self):
+        return self._state == _IntcodeState.SUSPENDED
+
     def start(self):
         self._assert_state(_IntcodeState.NOT_STARTED)
-        self._generator = self._run_generator()
-        self._step()
+        self._execute(_no_input, None, pause_on_output=True)
 
     def read_output(self):
         self._assert_state(_IntcodeState.OUTPUT_READY)
 
-        rtn = next(self._generator)
-        assert isinstance(rtn, int)
-        assert self._state == _IntcodeState.INTERMEDIATE
-        self._step()
+        rtn = self._output
+        self._output = None
+        self._execute(_no_input, None, pause_on_output=True)
         return rtn
 
     def write_input(self, value):
@@ -83,7 +330,115 @@ class Intcode:
             raise TypeError("value must be an integer")
 
         self._assert_state(_IntcodeState.WAITING_FOR_INPUT)
-        self._step(value)
+        self._execute(partial(next, iter([value]), None), None,
+                      pause_on_output=True)
+
+    def fork(self):
+        """Return an independent copy of this Intcode in its current state.
+
+        The copy shares memory pages and decoded instructions with the
+        original until either of them changes them, so forking is cheap even
+        for large programs.
+        """
+        if self._state == _IntcodeState.INTERMEDIATE:
+            raise IntcodeError("Intcode cannot be forked while running")
+        rtn = copy(self)
+        # profiling is not inherited
+        rtn.__dict__.pop('_execute', None)
+        rtn.profile = None
+        rtn.memory = self.memory.copy()
+        if self.profile is None:
+            self._decode_cache_owned = rtn._decode_cache_owned = False
+        else:
+            # the profiling decode cache is not shared
+            rtn._decoded = dict(self._decoded)
+            rtn._code_cells = set(self._code_cells)
+        rtn._watch_code_cells()
+        return rtn
+
+    def snapshot(self):
+        """Return the complete state of the machine as compact bytes.
+
+        The snapshot can be restored with from_snapshot, also in another
+        process running the same Python version. Profiling and caches are
+        not part of it.
+        """
+        if self._state == _IntcodeState.INTERMEDIATE:
+            raise IntcodeError("Intcode cannot be saved while running")
+        return _pack_snapshot((
+            self._state.value, self._p, self._relative_base, self._output,
+            self.memory._dump_pages()))
+
+    @classmethod
+    def from_snapshot(cls, data):
+        payload = _unpack_snapshot(data)
+        if not (isinstance(payload, tuple) and len(payload) == 5):
+            raise IntcodeError("Not an Intcode snapshot")
+        state, p, relative_base, output, pages = payload
+        rtn = cls([])
+        rtn.memory = InfiniteMemory._load_pages(pages)
+        rtn._watch_code_cells()
+        rtn._state = _IntcodeState(state)
+        rtn._p = p
+        rtn._relative_base = relative_base
+        rtn._output = output
+        return rtn
+
+    def save(self, path):
+        """Write a snapshot to a file, see snapshot."""
+        pathlib.Path(path).write_bytes(self.snapshot())
+
+    @classmethod
+    def load(cls, path):
+        """Restore an Intcode saved to a file with save."""
+        return cls.from_snapshot(pathlib.Path(path).read_bytes())
+
+    def enable_profiling(self):
+        """Start collecting execution statistics and return them.
+
+        The returned IntcodeProfile (also available as `profile`) counts
+        executed instructions per opcode and per address, instructions
+        between I/O events and the time spent executing. A profiled Intcode
+        is always interpreted, and profiling costs nothing while disabled.
+        """
+        if self.profile is None:
+            self.profile = IntcodeProfile()
+            self._own_decode_cache()
+            self._decoded = _ProfilingDecodeCache(
+                self._decoded, self.memory, self.profile)
+            self._execute = self._execute_profiled
+        return self.profile
+
+    def disable_profiling(self):
+        if self.profile is not None:
+            self._decoded = dict(self._decoded)
+            del self._execute
+            self.profile = None
+
+    def run(self, input_provider, output_sink, max_instructions=None):
+        """Run until the program finishes or input_provider returns None.
+
+        input_provider() is called whenever the program reads a value, and
+        output_sink(value) for every value it writes. When input_provider
+        returns None, the Intcode pauses (requires_input becomes true) and
+        run can be called again once more input is available.
+
+        With max_instructions, the Intcode is also suspended (suspended
+        becomes true) after executing that many instructions, and the
+        number of instructions executed is returned. Call run again to
+        resume it.
+
+        The Intcode does not need to be started first. Any output pending
+        from read_output-style usage is passed to output_sink first.
+        """
+        if self._state == _IntcodeState.OUTPUT_READY:
+            output_sink(self._output)
+            self._output = None
+        elif self._state not in (_IntcodeState.NOT_STARTED,
+                                 _IntcodeState.SUSPENDED):
+            self._assert_state(_IntcodeState.WAITING_FOR_INPUT)
+        return self._execute(input_provider, output_sink,
+                             max_instructions=max_instructions)
 
     def _assert_state(self, expected_state):
         if self._state == expected_state:
@@ -104,83 +459,220 @@ class Intcode:
         raise IntcodeError(f"Intcode is in state {self._state} "
                            f"and {expected_state} is expected.")
 
-    def _step(self, send_value=None):
-        try:
-            self._generator.send(send_value)
-        except StopIteration:
-            self._state = _IntcodeState.FINISHED
+    def _decode(self, p):
+        """Decode the instruction at address p and store it in the cache."""
+        instruction = decode_instruction(self.memory, p)
+        self._own_decode_cache()
+        self._decoded[p] = instruction
+        self._code_cells.update(range(p, instruction[1]))
+        return instruction
+
+    def _add_code_cells(self, cells):
+        """Invalidate cached code when one of cells is written to."""
+        self._own_decode_cache()
+        self._code_cells.update(cells)
 
-    def _run_generator(self):
+    def _own_decode_cache(self):
+        """Copy the decode cache if it is shared with a fork."""
+        if not self._decode_cache_owned:
+            self._decoded = dict(self._decoded)
+            self._code_cells = set(self._code_cells)
+            self._watch_code_cells()
+            self._decode_cache_owned = True
+
+    def _decode_all(self, end):
+        """Decode instructions found by a linear sweep of addresses 0 to end.
+
+        Data cells which do not decode as instructions are skipped.
+        """
         p = 0
-        relative_base = 0
+        while p < end:
+            try:
+                p = self._decode(p)[1]
+            except IntcodeError:
+                p += 1
+
+    def _watch_code_cells(self):
+        self.memory.watched = self._code_cells
+        self.memory.on_watched_write = self._invalidate
+
+    def _invalidate(self, address):
+        decoded = self._decoded
+        stale = [p for p in range(address - 3, address + 1)
+                 if p in decoded and decoded[p][1] > address]
+        if stale:
+            self._own_decode_cache()
+            for p in stale:
+                del self._decoded[p]
+
+    def _execute_profiled(self, read_input, write_output,
+                          pause_on_output=False, **kwargs):
+        profile = self.profile
+
+        def counted_input():
+            value = read_input()
+            if value is None:
+                profile._unrecord_instruction()
+            else:
+                profile._record_io()
+            return value
+
+        def counted_output(value):
+            profile._record_io()
+            write_output(value)
+
+        start = perf_counter()
+        try:
+            return Intcode._execute(self, counted_input, counted_output,
+                                    pause_on_output, **kwargs)
+        finally:
+            profile.elapsed_seconds += perf_counter() - start
+            if self._state == _IntcodeState.OUTPUT_READY:
+                profile._record_io()
+
+    def _execute(self, read_input, write_output, pause_on_output=False,
+                 stop_at_branches=False, max_instructions=None):
+        """Execute instructions until the program finishes or pauses.
+
+        The program pauses before an input instruction if read_input()
+        returns None. With pause_on_output, it also pauses after each output
+        instruction, keeping the value for read_output instead of passing it
+        to write_output.
+
+        With stop_at_branches, execution also returns (in the INTERMEDIATE
+        state) after the first jump or I/O instruction.
+
+        With max_instructions, execution is suspended after that many
+        instructions, and the number of instructions executed is returned.
+        """
+        self._state = _IntcodeState.INTERMEDIATE
+        p = self._p
+        relative_base = self._relative_base
         ops = self.memory
-        while True:
-            op_value = ops[p]
-            op = op_value % 100
-            modes =  dict(enumerate(reversed(str(op_value//100))))
-            def read(i):
-                mode = modes.get(i-1, '0')
-                assert mode in '012'
-                if mode == '0':
-                    return ops[ops[p+i]]
-                elif mode == '1':
-                    return ops[p+i]
-                elif mode == '2':
-                    return ops[relative_base+ops[p+i]]
-
-            def write(i, value):
-                mode = modes.get(i-1, '0')
-                assert mode in '02'
-                if mode == '0':
-                    ops[ops[p+i]] = value
-                elif mode == '2':
-                    ops[relative_base+ops[p+i]] = value
+
+        def read(mode, arg):
+            if mode == 0:
+                return ops[arg]
+            elif mode == 1:
+                return arg
+            else:
+                return ops[relative_base + arg]
+
+        def write(mode, arg, value):
+            address = arg if mode == 0 else relative_base + arg
+            ops[address] = value
+
+        # One item per instruction allowed. Iterating over repeat costs
+        # nothing per instruction, unlike counting in a variable.
+        if max_instructions is None:
+            steps = repeat(None)
+        else:
+            steps = repeat(None, max_instructions)
+        for _ in steps:
+            # not a local, invalidation may replace a shared cache
+            instruction = self._decoded.get(p)
+            if instruction is None:
+                instruction = self._decode(p)
+            op, next_p, m1, a1, m2, a2, m3, a3 = instruction
 
             if op == 1:
-                write(3, read(1) + read(2))
-                p += 4
+                write(m3, a3, read(m1, a1) + read(m2, a2))
+                p = next_p
             elif op == 2:
-                write(3, read(1) * read(2))
-                p += 4
+                write(m3, a3, read(m1, a1) * read(m2, a2))
+                p = next_p
             elif op == 3:
-                self._state = _IntcodeState.WAITING_FOR_INPUT
-                v = yield
-                write(1, v)
-                p += 2
+                v = read_input()
+                if v is None:
+                    self._state = _IntcodeState.WAITING_FOR_INPUT
+                    break
+                write(m1, a1, v)
+                p = next_p
+                if stop_at_branches:
+                    break
             elif op == 4:
-                v = read(1)
-                self._state = _IntcodeState.OUTPUT_READY
-                yield
-                self._state = _IntcodeState.INTERMEDIATE
-                yield v
-                p += 2
+                v = read(m1, a1)
+                p = next_p
+                if pause_on_output:
+                    self._output = v
+                    self._state = _IntcodeState.OUTPUT_READY
+                    break
+                write_output(v)
+                if stop_at_branches:
+                    break
             elif op == 5:
-                if read(1):
-                    p = read(2)
+                if read(m1, a1):
+                    p = read(m2, a2)
                 else:
-                    p += 3
+                    p = next_p
+                if stop_at_branches:
+                    break
             elif op == 6:
-                if not read(1):
-                    p = read(2)
+                if not read(m1, a1):
+                    p = read(m2, a2)
                 else:
-                    p += 3
+                    p = next_p
+                if stop_at_branches:
+                    break
             elif op == 7:
-                if read(1) < read(2):
-                    write(3, 1)
+                if read(m1, a1) < read(m2, a2):
+                    write(m3, a3, 1)
                 else:
-                    write(3, 0)
-                p += 4
+                    write(m3, a3, 0)
+                p = next_p
             elif op == 8:
-                if read(1) == read(2):
-                    write(3, 1)
+                if read(m1, a1) == read(m2, a2):
+                    write(m3, a3, 1)
                 else:
-                    write(3, 0)
-                p += 4
+                    write(m3, a3, 0)
+                p = next_p
             elif op == 9:
-                relative_base += read(1)
-                p += 2
+                relative_base += read(m1, a1)
+                p = next_p
             elif op == 99:
-                return
-            else:
-                raise Exception(f'Invalid opcode {op}')
+                self._state = _IntcodeState.FINISHED
+                break
+        else:
+            self._state = _IntcodeState.SUSPENDED
+
+        self._p = p
+        self._relative_base = relative_base
+        if max_instructions is not None:
+            executed = max_instructions - length_hint(steps)
+            if self._state == _IntcodeState.WAITING_FOR_INPUT:
+                # the input instruction was not executed
+                executed -= 1
+            return executed
+
+
+class IntcodePrototype:
+    """Frozen Intcode image from which new instances are created cheaply.
+
+    The program is loaded, patched, decoded and (with warm_up) run until it
+    first needs input only once. Every instance is a fork of that image, so
+    it only copies the memory pages it writes to.
+
+    Typical usage example:
+
+        prototype = IntcodePrototype(code_bytes, warm_up=True)
+        for x in range(100):
+            ic = prototype.instantiate()
+            ic.write_input(x)
+            print(ic.read_output())
+
+    """
+    def __init__(self, opcodes, patches=None, warm_up=False):
+        opcodes = list(opcodes)
+        self._ic = Intcode(opcodes)
+        for address, value in (patches or {}).items():
+            self._ic.memory[address] = value
+        self._ic._decode_all(len(opcodes))
+        if warm_up:
+            self._ic.start()
+
+    def instantiate(self):
+        return self._ic.fork()
+
 
+def _no_input():
+    return None
@@ -0,0 +1,74 @@
+from collections import deque
+
+from intcode import IntcodeError
+
+
+class AsciiIntcode:
+    """Text interface to an Intcode program which talks in ASCII.
+
+    Text written is queued as input, and the program runs until it needs
+    more input than that, collecting all its output at once. Output values
+    which are not characters (256 and above) are collected in `values`.
+
+    Typical usage example:
+
+        ascii = AsciiIntcode(Intcode(code_bytes))
+        assert ascii.read_line() == 'Command?'
+        ascii.write_line('inv')
+        print(ascii.read())
+
+    """
+    def __init__(self, ic):
+        self.ic = ic
+        self.values = []
+        self._input = deque()
+        self._output = []
+        self._text = ''
+
+    @property
+    def finished(self):
+        return self.ic.finished
+
+    def write(self, text):
+        self._input.extend(map(ord, text))
+        self._run()
+
+    def write_line(self, text):
+        self.write(text + '\n')
+
+    def read(self):
+        """Return all text written by the program since the last read."""
+        self._run()
+        rtn, self._text = self._text, ''
+        return rtn
+
+    def read_line(self):
+        """Return the next line of text, without the newline."""
+        self._run()
+        line, newline, rest = self._text.partition('\n')
+        if not newline:
+            raise IntcodeError(f'No complete line in output {self._text!r}')
+        self._text = rest
+        return line
+
+    def read_lines(self):
+        """Return all complete lines of text written by the program."""
+        self._run()
+        *lines, self._text = self._text.split('\n')
+        return lines
+
+    def _read_input(self):
+        return self._input.popleft() if self._input else None
+
+    def _run(self):
+        if not self.ic.finished:
+            self.ic.run(self._read_input, self._output.append)
+        if not self._output:
+            return
+        codes, self._output = self._output, []
+        try:
+            self._text += bytes(codes).decode('latin-1')
+        except ValueError:
+            # some values are not characters
+            self.values += [c for c in codes if not 0 <= c < 256]
+            self._text += ''.join(chr(c) for c in codes if 0 <= c < 256)
@@ -0,0 +1,40 @@
+import asyncio
+
+
+class AsyncIntcode:
+    """Runs an Intcode as a coroutine, connected by asyncio queues.
+
+    Input values are taken from the `inputs` queue and outputs are put to
+    the `outputs` queue. While input is available, the program runs without
+    returning to the event loop. When it needs input and the queue is empty,
+    the coroutine awaits the next value, letting other coroutines run.
+
+    Typical usage example:
+
+        a = AsyncIntcode(Intcode(code_bytes))
+        b = AsyncIntcode(Intcode(code_bytes), inputs=a.outputs)
+        a.inputs.put_nowait(44)
+        await asyncio.gather(a.run(), b.run())
+
+    """
+    def __init__(self, ic, inputs=None, outputs=None):
+        self.ic = ic
+        self.inputs = asyncio.Queue() if inputs is None else inputs
+        self.outputs = asyncio.Queue() if outputs is None else outputs
+
+    async def run(self):
+        """Run the program until it finishes."""
+        awaited = []
+
+        def read_input():
+            if awaited:
+                return awaited.pop()
+            if self.inputs.empty():
+                return None
+            return self.inputs.get_nowait()
+
+        while True:
+            self.ic.run(read_input, self.outputs.put_nowait)
+            if self.ic.finished:
+                return
+            awaited.append(await self.inputs.get())
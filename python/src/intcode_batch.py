@@ -0,0 +1,172 @@
+import numpy as np
+
+from intcode import IntcodeError, _PARAMETER_COUNTS, _WRITE_PARAMETERS
+
+
+_MIN_INT64 = np.iinfo(np.int64).min
+
+
+class IntcodeBatch:
+    """Many instances of one Intcode program, run in lockstep with NumPy.
+
+    Each instance gets its own memory row, instruction pointer, relative base
+    and list of input values given up front. In every step, the running
+    instances are grouped by the instruction word at their instruction
+    pointer, and each group executes that instruction as one vectorized
+    operation, so diverging instances are simply in different groups.
+
+    Values must fit in 64 bits, OverflowError is raised otherwise. The
+    program is best given as an int64 array, like read_integer_array returns,
+    but any sequence of integers works.
+
+    Typical usage example:
+
+        batch = IntcodeBatch(read_integer_array(filename), inputs=[[x, y] for x, y in coords])
+        batch.run()
+        print(batch.outputs)
+
+    """
+    def __init__(self, opcodes, count=None, inputs=None, patches=None):
+        opcodes = np.asarray(opcodes, dtype=np.int64)
+        if count is None:
+            count = len(inputs)
+        if inputs is None:
+            inputs = [[]] * count
+        assert len(inputs) == count
+
+        self.count = count
+        self.memory = np.zeros((count, 2 * len(opcodes)), dtype=np.int64)
+        self.memory[:, :len(opcodes)] = opcodes
+        for address, values in (patches or {}).items():
+            self._ensure_size(address)
+            self.memory[:, address] = values
+
+        self.p = np.zeros(count, dtype=np.int64)
+        self.relative_base = np.zeros(count, dtype=np.int64)
+        self.running = np.ones(count, dtype=bool)
+        self.finished = np.zeros(count, dtype=bool)
+        self.requires_input = np.zeros(count, dtype=bool)
+        self.outputs = [[] for _i in range(count)]
+
+        self._input_count = np.array([len(i) for i in inputs], dtype=np.int64)
+        self._input_position = np.zeros(count, dtype=np.int64)
+        self._inputs = np.zeros((count, max(self._input_count, default=0) + 1),
+                                dtype=np.int64)
+        for i, values in enumerate(inputs):
+            self._inputs[i, :len(values)] = values
+
+    def run(self):
+        """Run until every instance finishes or waits for more input."""
+        while True:
+            instances = np.flatnonzero(self.running)
+            if not len(instances):
+                return
+            if self.p[instances].min() < 0:
+                # NumPy would index from the end of the row
+                raise IndexError(
+                    f'Negative memory address {self.p[instances].min()}')
+            self._ensure_size(self.p[instances].max() + 3)
+            words = self.memory[instances, self.p[instances]]
+            for word in np.unique(words):
+                self._execute(int(word), instances[words == word])
+
+    def _ensure_size(self, address):
+        size = self.memory.shape[1]
+        if address >= size:
+            new_size = max(int(address) + 1, 2 * size)
+            grown = np.zeros((self.count, new_size), dtype=np.int64)
+            grown[:, :size] = self.memory
+            self.memory = grown
+
+    def _address(self, instances, mode, arg):
+        if mode == 2:
+            address = self.relative_base[instances] + arg
+        else:
+            address = arg
+        if len(address):
+            if address.min() < 0:
+                raise IndexError('Negative memory address')
+            self._ensure_size(address.max())
+        return address
+
+    def _read(self, instances, mode, arg):
+        if mode == 1:
+            return arg
+        # the address first, as it may grow self.memory
+        address = self._address(instances, mode, arg)
+        return self.memory[instances, address]
+
+    def _write(self, instances, mode, arg, values):
+        address = self._address(instances, mode, arg)
+        self.memory[instances, address] = values
+
+    def _execute(self, word, instances):
+        op = word % 100
+        if op not in _PARAMETER_COUNTS:
+            raise IntcodeError(f'Invalid opcode {op}')
+        parameter_count = _PARAMETER_COUNTS[op]
+        modes = []
+        for i in range(1, parameter_count + 1):
+            mode = word // 10 ** (i + 1) % 10
+            if mode not in (0, 1, 2):
+                raise IntcodeError(f'Invalid parameter mode {mode}')
+            if mode == 1 and (op, i) in _WRITE_PARAMETERS:
+                raise IntcodeError('Parameters written to cannot be immediate')
+            modes.append(mode)
+
+        p = self.p[instances]
+        args = [self.memory[instances, p + i]
+                for i in range(1, parameter_count + 1)]
+        next_p = p + parameter_count + 1
+
+        def read(i):
+            return self._read(instances, modes[i], args[i])
+
+        if op in (1, 2):
+            x, y = read(0), read(1)
+            with np.errstate(over='ignore'):
+                if op == 1:
+                    result = x + y
+                    # the sign flips only if both terms have the other sign
+                    overflow = ((x ^ result) & (y ^ result)) < 0
+                else:
+                    result = x * y
+                    nonzero = y != 0
+                    overflow = nonzero & (
+                        result // np.where(nonzero, y, 1) != x)
+                    # the division above wraps, too
+                    overflow |= (x == _MIN_INT64) & (y == -1)
+            if overflow.any():
+                raise OverflowError('Intcode value does not fit in 64 bits')
+            self._write(instances, modes[2], args[2], result)
+        elif op == 3:
+            available = self._input_position[instances] < self._input_count[instances]
+            waiting = instances[~available]
+            self.running[waiting] = False
+            self.requires_input[waiting] = True
+            instances = instances[available]
+            next_p = next_p[available]
+            position = self._input_position[instances]
+            self._write(instances, modes[0], args[0][available],
+                        self._inputs[instances, position])
+            self._input_position[instances] = position + 1
+        elif op == 4:
+            for i, value in zip(instances, read(0)):
+                self.outputs[i].append(int(value))
+        elif op in (5, 6):
+            taken = read(0) != 0
+            if op == 6:
+                taken = ~taken
+            next_p[taken] = self._read(instances[taken], modes[1], args[1][taken])
+        elif op in (7, 8):
+            x, y = read(0), read(1)
+            result = x < y if op == 7 else x == y
+            self._write(instances, modes[2], args[2], result.astype(np.int64))
+        elif op == 9:
+            self.relative_base[instances] += read(0)
+        elif op == 99:
+            self.running[instances] = False
+            self.finished[instances] = True
+            return
+
+        self.p[instances] = next_p
@@ -0,0 +1,405 @@
+import os
+import sys
+import marshal
+import hashlib
+import pathlib
+
+import intcode
+from intcode import (
+    Intcode, IntcodeError, _IntcodeState, _PAGE_SIZE, decode_instruction,
+    _pack_snapshot, _unpack_snapshot)
+
+
+CACHE_DIRECTORY = pathlib.Path(__file__).parent.parent / '.cache' / 'intcode'
+
+# a block is cut after this many instructions
+MAX_BLOCK_LENGTH = 200
+
+# cached code is only used with the generator (and decoder) which made it
+_GENERATOR_HASH = hashlib.sha256(
+    pathlib.Path(__file__).read_bytes() +
+    pathlib.Path(intcode.__file__).read_bytes()).hexdigest()
+
+
+class _BlockGenerator:
+    """Generates Python source of a function executing one block of code.
+
+    The generated function takes the memory, the relative base and the input
+    and output callbacks, and returns the address of the next instruction
+    and the new relative base. A block ends after an output instruction, or
+    before an input instruction when the input callback returns None.
+    Memory cells at fixed addresses are kept in local variables while the
+    block runs, and written back before any access through a computed
+    address and before leaving the block.
+
+    Parameters in `dynamic_cells` are not baked into the code, they are read
+    from memory when the instruction runs. This keeps programs which patch
+    their own parameters (e.g. to index arrays) compiled. All other cells of
+    the block, listed in `baked_cells`, must not change for it to be valid.
+    """
+    def __init__(self, image, entry, dynamic_cells):
+        self.image = image
+        self.entry = entry
+        self.dynamic_cells = dynamic_cells
+        self.baked_cells = []
+        self.lines = []
+        self.loaded = set()
+        self.dirty = set()
+        self.written = set()
+
+    def emit(self, line, extra_indent=0):
+        self.lines.append('    ' * (2 + extra_indent) + line)
+
+    def flush(self, extra_indent=0, forget=True):
+        for address in sorted(self.dirty):
+            self.emit(f'm[{address}] = c{address}', extra_indent)
+        if forget:
+            self.dirty.clear()
+
+    def exit(self, target, extra_indent=0):
+        """Leave the block (or loop back to its start) with flushed memory."""
+        self.flush(extra_indent, forget=False)
+        if target == str(self.entry):
+            self.emit('__LOOP__', extra_indent)
+        else:
+            self.emit(f'return {target}, rb', extra_indent)
+
+    def cell(self, address):
+        if address not in self.loaded:
+            if address < len(self.image):
+                # the page exists, read it directly
+                page, offset = divmod(address, _PAGE_SIZE)
+                self.emit(f'c{address} = P[{page}][{offset}]')
+            else:
+                self.emit(f'c{address} = m[{address}]')
+            self.loaded.add(address)
+        return f'c{address}'
+
+    def parameter(self, address):
+        """Value of the parameter stored at address: an int or an expression."""
+        if address in self.dynamic_cells:
+            return self.cell(address)
+        self.baked_cells.append(address)
+        return self.image[address]
+
+    def read(self, mode, arg):
+        if mode == 1:
+            return str(arg)
+        if mode == 0 and isinstance(arg, int) and arg >= 0:
+            return self.cell(arg)
+        self.flush()
+        if mode == 0:
+            return f'm[{arg}]'
+        return f'm[rb + {arg}]'
+
+    def write(self, mode, arg, expression, next_p):
+        if mode == 0 and isinstance(arg, int) and arg >= 0:
+            self.emit(f'c{arg} = {expression}')
+            self.loaded.add(arg)
+            self.dirty.add(arg)
+            self.written.add(arg)
+            return
+        self.flush()
+        address = str(arg) if mode == 0 else f'rb + {arg}'
+        self.emit(f'a = {address}')
+        self.emit(f'm[a] = {expression}')
+        self.loaded.clear()
+        # the program may have just overwritten code of this very block
+        self.emit(f'if {self.code_guard()}:')
+        self.emit(f'return {next_p}, rb', 1)
+
+    def code_guard(self):
+        """Condition on the written address `a` for leaving the block."""
+        return f'{self.entry} <= a < __END__'
+
+    def decode(self, p):
+        """Decode the instruction at p, None if it cannot be compiled."""
+        try:
+            op, next_p, m1, a1, m2, a2, m3, a3 = decode_instruction(self.image, p)
+        except (IntcodeError, IndexError):
+            # invalid code or the end of the image
+            return None
+        if op == 99:
+            return None
+        cells = [p] + [a for a in range(p + 1, next_p)
+                       if a not in self.dynamic_cells]
+        if self.written.intersection(cells):
+            return None
+
+        self.baked_cells.append(p)
+        a1, a2, a3 = [self.parameter(p + i) if p + i < next_p else 0
+                      for i in (1, 2, 3)]
+        return op, next_p, m1, a1, m2, a2, m3, a3
+
+    def straight(self, p, op, next_p, m1, a1, m2, a2, m3, a3):
+        """Emit an instruction other than a jump.
+
+        Return True if the block ends after it (an output instruction).
+        """
+        if op == 1:
+            x, y = self.read(m1, a1), self.read(m2, a2)
+            self.write(m3, a3, f'{x} + {y}', next_p)
+        elif op == 2:
+            x, y = self.read(m1, a1), self.read(m2, a2)
+            self.write(m3, a3, f'{x} * {y}', next_p)
+        elif op == 7:
+            x, y = self.read(m1, a1), self.read(m2, a2)
+            self.write(m3, a3, f'1 if {x} < {y} else 0', next_p)
+        elif op == 8:
+            x, y = self.read(m1, a1), self.read(m2, a2)
+            self.write(m3, a3, f'1 if {x} == {y} else 0', next_p)
+        elif op == 3:
+            self.flush()
+            self.emit('v = inp()')
+            self.emit('if v is None:')
+            self.emit(f'return {p}, rb', 1)
+            self.loaded.clear()
+            self.write(m1, a1, 'v', next_p)
+        elif op == 4:
+            self.emit(f'v = {self.read(m1, a1)}')
+            self.flush()
+            self.emit('out(v)')
+            self.emit(f'return {next_p}, rb')
+            return True
+        elif op == 9:
+            self.emit(f'rb += {self.read(m1, a1)}')
+        return False
+
+    def generate(self):
+        """Return the block's source and baked cells, None if it is empty."""
+        p = self.entry
+        returned = False
+        for _i in range(MAX_BLOCK_LENGTH):
+            instruction = self.decode(p)
+            if instruction is None:
+                break
+            op, next_p, m1, a1, m2, a2, _m3, _a3 = instruction
+            if op == 5 or op == 6:
+                condition = self.read(m1, a1)
+                target = self.read(m2, a2)
+                self.emit(f'if {"" if op == 5 else "not "}{condition}:')
+                self.exit(target, 1)
+            elif self.straight(p, *instruction):
+                returned = True
+            p = next_p
+            if returned:
+                break
+
+        if p == self.entry:
+            return None
+        if not returned:
+            self.exit(str(p))
+        return self.finish(end=p), tuple(self.baked_cells)
+
+    def finish(self, end):
+        """Return the source of the function."""
+        if self.written.intersection(self.baked_cells):
+            loop = f'return {self.entry}, rb'
+        else:
+            loop = 'continue'
+        body = '\n'.join(self.lines)
+        body = body.replace('__LOOP__', loop).replace('__END__', str(end))
+        return ('def block(m, rb, inp, out):\n'
+                '    P = m._pages\n'
+                f'    while True:\n{body}\n')
+
+
+def _find_written_parameters(image):
+    """Find parameters which the program overwrites at fixed addresses.
+
+    Instructions are found by a linear sweep, skipping cells which do not
+    decode, so the result is a guess. Any guess is safe though, it only
+    decides which parameters are compiled as memory reads.
+    """
+    rtn = set()
+    p = 0
+    while p < len(image):
+        try:
+            op, next_p, *parameters = decode_instruction(image, p)
+        except (IntcodeError, IndexError):
+            p += 1
+            continue
+        if op in (1, 2, 7, 8) and parameters[4] == 0:
+            rtn.add(parameters[5])
+        elif op == 3 and parameters[0] == 0:
+            rtn.add(parameters[1])
+        p = next_p
+    return frozenset(a for a in rtn if 0 <= a < len(image))
+
+
+class _Program:
+    """Compiled blocks of one Intcode image, cached on disk."""
+    def __init__(self, image):
+        self.image = image
+        key = hashlib.sha256(
+            ','.join(map(str, image)).encode() +
+            _GENERATOR_HASH.encode()).hexdigest()
+        tag = sys.implementation.cache_tag
+        self.cache_path = CACHE_DIRECTORY / f'{key}.{tag}.marshal'
+        self.dynamic_cells = _find_written_parameters(image)
+        # entry -> (baked cells, code object), or None if it is not compiled
+        self._code = self._load()
+        self._modified = False
+        # entry -> (function, baked cells), or None
+        self.blocks = {}
+        # address -> entries of all blocks containing it
+        self.cell_entries = {}
+
+    def _load(self):
+        try:
+            return marshal.loads(self.cache_path.read_bytes())
+        except (OSError, EOFError, ValueError, TypeError):
+            return {}
+
+    def save(self):
+        if not self._modified:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp_path.write_bytes(marshal.dumps(self._code))
+        os.replace(tmp_path, self.cache_path)
+        self._modified = False
+
+    def get_block(self, entry):
+        if entry in self.blocks:
+            return self.blocks[entry]
+        if entry < 0:
+            # as the interpreter, which cannot read the instruction either
+            raise IndexError(f'Negative memory address {entry}')
+
+        if entry not in self._code:
+            generator = _BlockGenerator(self.image, entry, self.dynamic_cells)
+            generated = generator.generate()
+            if generated is not None:
+                source, cells = generated
+                code = compile(source, f'<intcode block {entry}>', 'exec')
+                generated = cells, code
+            self._code[entry] = generated
+            self._modified = True
+
+        compiled = self._code[entry]
+        if compiled is None:
+            block = None
+        else:
+            cells, code = compiled
+            namespace = {}
+            exec(code, namespace)
+            block = namespace['block'], cells
+            for address in cells:
+                self.cell_entries.setdefault(address, []).append(entry)
+        self.blocks[entry] = block
+        return block
+
+
+_programs = {}
+
+
+def _get_program(image):
+    if image not in _programs:
+        _programs[image] = _Program(image)
+    return _programs[image]
+
+
+class CompiledIntcode(Intcode):
+    """Intcode which runs the program as compiled Python functions.
+
+    Each basic block of the original program image is translated to Python
+    the first time it is entered. The translations are cached on disk, keyed
+    by a hash of the image and of the compiler's source, so later runs skip
+    the compilation. Code which the program has overwritten is run by the
+    interpreter.
+
+    CompiledIntcode is used exactly like Intcode.
+    """
+    def __init__(self, opcodes):
+        image = tuple(opcodes)
+        super().__init__(image)
+        self._program = _get_program(image)
+        # entry -> block function, verified against this memory
+        self._blocks = {}
+        # entries which have to be interpreted
+        self._rejected = set()
+
+    def fork(self):
+        rtn = super().fork()
+        rtn._blocks = self._blocks.copy()
+        rtn._rejected = self._rejected.copy()
+        return rtn
+
+    def snapshot(self):
+        # the original image is needed to find and verify compiled blocks
+        return _pack_snapshot((self._program.image, super().snapshot()))
+
+    @classmethod
+    def from_snapshot(cls, data):
+        payload = _unpack_snapshot(data)
+        if not (isinstance(payload, tuple) and len(payload) == 2
+                and isinstance(payload[1], bytes)):
+            raise IntcodeError("Not a CompiledIntcode snapshot")
+        image, data = payload
+        rtn = super().from_snapshot(data)
+        # zero pages are not saved, but blocks read image pages directly
+        rtn.memory._add_zero_pages(len(image))
+        rtn._program = _get_program(image)
+        return rtn
+
+    def _invalidate(self, address):
+        super()._invalidate(address)
+        for entry in self._program.cell_entries.get(address, ()):
+            self._blocks.pop(entry, None)
+            self._rejected.add(entry)
+
+    def _accept_block(self, entry):
+        if entry in self._rejected:
+            return None
+        block = self._program.get_block(entry)
+        if block is not None:
+            function, cells = block
+            image = self._program.image
+            memory = self.memory
+            if all(memory[a] == image[a] for a in cells):
+                self._add_code_cells(cells)
+                self._blocks[entry] = function
+                return function
+        self._rejected.add(entry)
+        return None
+
+    def _execute(self, read_input, write_output, pause_on_output=False,
+                 max_instructions=None):
+        if max_instructions is not None:
+            # blocks cannot stop in the middle, so a budget is interpreted
+            return super()._execute(read_input, write_output, pause_on_output,
+                                    max_instructions=max_instructions)
+        memory = self.memory
+        blocks = self._blocks
+        running = _IntcodeState.INTERMEDIATE
+
+        def inp():
+            value = read_input()
+            if value is None:
+                self._state = _IntcodeState.WAITING_FOR_INPUT
+            return value
+
+        if pause_on_output:
+            def out(value):
+                self._output = value
+                self._state = _IntcodeState.OUTPUT_READY
+        else:
+            out = write_output
+
+        self._state = running
+        p = self._p
+        rb = self._relative_base
+        try:
+            while self._state is running:
+                block = blocks.get(p) or self._accept_block(p)
+                if block is None:
+                    self._p, self._relative_base = p, rb
+                    super()._execute(read_input, write_output, pause_on_output,
+                                     stop_at_branches=True)
+                    p, rb = self._p, self._relative_base
+                else:
+                    p, rb = block(memory, rb, inp, out)
+        finally:
+            self._p, self._relative_base = p, rb
+            self._program.save()
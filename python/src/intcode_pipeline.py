@@ -0,0 +1,67 @@
+from collections import deque
+
+
+class IntcodePipeline:
+    """Intcode instances connected by channels, run until none can continue.
+
+    Each instance (node) reads its input channel, and its outputs go to the
+    input channel of the node it is connected to, or to its own output
+    channel if it is not connected. Any topology is allowed, including
+    feedback loops. The runner lets each node consume all values waiting
+    for it in one go, so no Python code runs per value passed.
+
+    Typical usage example:
+
+        pipeline = IntcodePipeline()
+        pipeline.add('a', Intcode(code_bytes), [44])
+        pipeline.add('b', Intcode(code_bytes))
+        pipeline.connect('a', 'b')
+        pipeline.run()
+        print(list(pipeline.outputs('b')))
+
+    """
+    def __init__(self):
+        self._nodes = {}
+        self._inputs = {}
+        self._outputs = {}
+
+    def add(self, name, ic, inputs=()):
+        """Add a node with some values already waiting in its input."""
+        assert name not in self._nodes
+        self._nodes[name] = ic
+        self._inputs[name] = deque(inputs)
+        self._outputs[name] = deque()
+
+    def connect(self, source, target):
+        """Send all outputs of source to the input of target."""
+        self._outputs[source] = self._inputs[target]
+
+    def inputs(self, name):
+        """Values sent to the node which it did not read (yet)."""
+        return self._inputs[name]
+
+    def outputs(self, name):
+        """Values written by an unconnected node."""
+        return self._outputs[name]
+
+    def run(self):
+        """Run until every node is finished or waits for an empty channel."""
+        progress = True
+        while progress:
+            progress = False
+            for name, ic in self._nodes.items():
+                channel = self._inputs[name]
+                if ic.finished or (ic.requires_input and not channel):
+                    continue
+                ic.run(_channel_reader(channel), self._outputs[name].append)
+                progress = True
+
+    @property
+    def finished(self):
+        return all(ic.finished for ic in self._nodes.values())
+
+
+def _channel_reader(channel):
+    def read():
+        return channel.popleft() if channel else None
+    return read
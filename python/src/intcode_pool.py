@@ -0,0 +1,81 @@
+import os
+import multiprocessing
+from functools import partial
+from itertools import islice
+
+from intcode import IntcodePrototype
+
+
+# the prototype of the program, created once in each worker process
+_prototype = None
+
+
+def _initialize_worker(opcodes):
+    global _prototype
+    _prototype = IntcodePrototype(opcodes)
+
+
+def _run_job(function, job):
+    return function(_prototype.instantiate(), job)
+
+
+class IntcodePool:
+    """Runs many independent instances of one Intcode program in processes.
+
+    The program is sent to each worker process once, when the pool starts.
+    For each job, `function(ic, job)` is called in a worker, with a fresh
+    Intcode instance, and its return value is sent back. The function must
+    be picklable, i.e. defined at the top level of a module.
+
+    Results always come in the order of the jobs, regardless of which
+    worker finished first.
+
+    Typical usage example:
+
+        with IntcodePool(code_bytes) as pool:
+            results = pool.map(run_with_settings, all_settings)
+
+    """
+    def __init__(self, opcodes, processes=None, chunk_size=1):
+        self._chunk_size = chunk_size
+        self._processes = processes or os.cpu_count() or 1
+        self._pool = multiprocessing.Pool(
+            processes, _initialize_worker, (tuple(opcodes),))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stop the workers, abandoning any jobs still running."""
+        self._pool.terminate()
+        self._pool.join()
+
+    def imap(self, function, jobs):
+        """Lazily yield function results in the order of the jobs."""
+        return self._pool.imap(
+            partial(_run_job, function), jobs, self._chunk_size)
+
+    def map(self, function, jobs):
+        """Return a list of function results in the order of the jobs."""
+        return list(self.imap(function, jobs))
+
+    def first(self, function, jobs):
+        """Return the first job (in order) and its result which is not None.
+
+        Jobs are taken lazily, as many at a time as there are workers, so
+        they may come from an endless iterator. The remaining jobs of the
+        last batch are not waited for, their results are discarded and
+        closing the pool stops any of them still running.
+        Return None if all results are None.
+        """
+        jobs = iter(jobs)
+        while True:
+            batch = list(islice(jobs, self._processes))
+            if not batch:
+                return None
+            for job, result in zip(batch, self.imap(function, batch)):
+                if result is not None:
+                    return job, result
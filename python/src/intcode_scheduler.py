@@ -0,0 +1,90 @@
+from collections import deque
+
+
+class IntcodeTask:
+    """An Intcode run by IntcodeScheduler, with its I/O and accounting."""
+    def __init__(self, ic, input_provider, output_sink, weight):
+        self.ic = ic
+        self.input_provider = input_provider
+        self.output_sink = output_sink
+        self.weight = weight
+        self.instructions = 0
+        self.slices = 0
+        self._queued = False
+
+    def __repr__(self):
+        return (f'<IntcodeTask instructions={self.instructions} '
+                f'slices={self.slices}>')
+
+    @property
+    def finished(self):
+        return self.ic.finished
+
+    @property
+    def blocked(self):
+        return self.ic.requires_input and not self._queued
+
+
+class IntcodeScheduler:
+    """Runs many Intcode instances round-robin, in slices of instructions.
+
+    Each task runs for at most `quantum * weight` instructions at a time,
+    so a program in a long computation cannot starve the others. A task
+    whose input_provider returns None is blocked and not run again until
+    it is passed to wake().
+
+    If `priority` is given, priority(task) is called for the ready tasks
+    each time the next one is picked, and one with the highest value runs.
+    Tasks of equal priority take turns. As it is called anew every time,
+    and a task's weight is read for each slice, both may change while the
+    scheduler runs.
+
+    Typical usage example:
+
+        scheduler = IntcodeScheduler(quantum=1000)
+        for ic in instances:
+            scheduler.add(ic, read_input, write_output)
+        scheduler.run()
+
+    """
+    def __init__(self, quantum=1000, priority=None):
+        self.quantum = quantum
+        self.priority = priority
+        self.tasks = []
+        self._ready = deque()
+
+    def add(self, ic, input_provider, output_sink, weight=1):
+        """Add a task ready to run, the weight multiplies its slice length."""
+        task = IntcodeTask(ic, input_provider, output_sink, weight)
+        self.tasks.append(task)
+        self._enqueue(task)
+        return task
+
+    def wake(self, task):
+        """Make a blocked task ready, e.g. when input became available."""
+        if not task._queued and not task.finished:
+            self._enqueue(task)
+
+    def run(self):
+        """Run ready tasks until all of them are blocked or finished."""
+        while self._ready:
+            task = self._next_task()
+            task._queued = False
+            task.instructions += task.ic.run(
+                task.input_provider, task.output_sink,
+                max_instructions=self.quantum * task.weight)
+            task.slices += 1
+            if task.ic.suspended and not task._queued:
+                self._enqueue(task)
+
+    def _next_task(self):
+        if self.priority is None:
+            return self._ready.popleft()
+        # the first of the highest, which has waited longest
+        task = max(self._ready, key=self.priority)
+        self._ready.remove(task)
+        return task
+
+    def _enqueue(self, task):
+        task._queued = True
+        self._ready.append(task)
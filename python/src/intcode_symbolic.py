@@ -0,0 +1,200 @@
+from collections import defaultdict
+
+from intcode import IntcodeError, decode_instruction
+
+
+class SymbolicDependenceError(IntcodeError):
+    """The program cannot continue without concrete values of its symbols."""
+
+
+class Polynomial:
+    """Polynomial with integer coefficients in named symbols.
+
+    Terms map monomials (sorted tuples of symbol names, repeated for
+    powers) to coefficients.
+    """
+    def __init__(self, terms):
+        self.terms = {monomial: coefficient
+                      for monomial, coefficient in terms.items()
+                      if coefficient != 0}
+
+    @classmethod
+    def symbol(cls, name):
+        return cls({(name,): 1})
+
+    def __add__(self, other):
+        terms = defaultdict(int, self.terms)
+        for monomial, coefficient in _as_polynomial(other).terms.items():
+            terms[monomial] += coefficient
+        return Polynomial(terms)
+
+    __radd__ = __add__
+
+    def __mul__(self, other):
+        terms = defaultdict(int)
+        for monomial1, coefficient1 in self.terms.items():
+            for monomial2, coefficient2 in _as_polynomial(other).terms.items():
+                monomial = tuple(sorted(monomial1 + monomial2))
+                terms[monomial] += coefficient1 * coefficient2
+        return Polynomial(terms)
+
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        return self.terms == _as_polynomial(other).terms
+
+    def __repr__(self):
+        if not self.terms:
+            return '0'
+        parts = []
+        for monomial, coefficient in sorted(
+                self.terms.items(), key=lambda t: (-len(t[0]), t[0])):
+            factors = list(monomial)
+            if coefficient != 1 or not factors:
+                factors.insert(0, str(coefficient))
+            parts.append(' * '.join(factors))
+        return ' + '.join(parts)
+
+    @property
+    def symbols(self):
+        return {name for monomial in self.terms for name in monomial}
+
+    def evaluate(self, values):
+        """Substitute symbol values, which may also be NumPy arrays."""
+        rtn = 0
+        for monomial, coefficient in self.terms.items():
+            term = coefficient
+            for name in monomial:
+                term = term * values[name]
+            rtn = rtn + term
+        return rtn
+
+
+def _as_polynomial(value):
+    if isinstance(value, Polynomial):
+        return value
+    return Polynomial({(): value})
+
+
+def _simplify(value):
+    """Return a constant polynomial as an int."""
+    if isinstance(value, Polynomial) and not value.symbols:
+        return value.terms.get((), 0)
+    return value
+
+
+class _SymbolicMemory(dict):
+    def __missing__(self, address):
+        return 0
+
+
+class SymbolicIntcode:
+    """Runs an Intcode program with some memory cells left as symbols.
+
+    Values computed from symbols by additions and multiplications are kept
+    as Polynomials. Values which cannot be expressed that way (comparisons
+    of symbolic values, reads from symbolic addresses) become unknown,
+    which is fine until they are used.
+
+    Outputs may be Polynomials. When a jump condition or target, an address
+    or an opcode depends on the symbols, or an output is unknown,
+    SymbolicDependenceError is raised, and the program must be run with
+    concrete values instead.
+
+    Typical usage example:
+
+        ic = SymbolicIntcode(code_bytes, {1: 'noun', 2: 'verb'})
+        ic.run()
+        print(ic.expression(0).evaluate({'noun': 12, 'verb': 2}))
+
+    """
+    # value of cells which are neither known nor a polynomial of the symbols
+    UNKNOWN = None
+
+    def __init__(self, opcodes, symbols):
+        self.memory = _SymbolicMemory(enumerate(opcodes))
+        for address, name in symbols.items():
+            self.memory[address] = Polynomial.symbol(name)
+        self.outputs = []
+
+    def expression(self, address):
+        """Return the value at address as a Polynomial, even if constant."""
+        value = self.memory[address]
+        if value is self.UNKNOWN:
+            raise SymbolicDependenceError(
+                f'Value at address {address} is unknown')
+        return _as_polynomial(value)
+
+    def run(self, inputs=()):
+        """Run until the program finishes, return its outputs."""
+        inputs = iter(inputs)
+        memory = self.memory
+        p = 0
+        relative_base = 0
+
+        def concrete(value, what):
+            if not isinstance(value, int):
+                raise SymbolicDependenceError(
+                    f'{what} at address {p} depends on symbols')
+            return value
+
+        def address(mode, arg):
+            if mode == 0:
+                rtn = concrete(arg, 'Address')
+            else:
+                rtn = relative_base + concrete(arg, 'Address')
+            if rtn < 0:
+                raise IndexError(f'Negative memory address {rtn}')
+            return rtn
+
+        def read(mode, arg):
+            if mode == 1:
+                return arg
+            if not isinstance(arg, int):
+                return self.UNKNOWN
+            return memory[address(mode, arg)]
+
+        def write(mode, arg, value):
+            memory[address(mode, arg)] = _simplify(value)
+
+        def combine(x, y, operation):
+            if x is self.UNKNOWN or y is self.UNKNOWN:
+                return self.UNKNOWN
+            return operation(x, y)
+
+        while True:
+            concrete(memory[p], 'Opcode')
+            op, next_p, m1, a1, m2, a2, m3, a3 = decode_instruction(memory, p)
+
+            if op == 1:
+                write(m3, a3, combine(read(m1, a1), read(m2, a2),
+                                      lambda x, y: x + y))
+            elif op == 2:
+                write(m3, a3, combine(read(m1, a1), read(m2, a2),
+                                      lambda x, y: x * y))
+            elif op == 3:
+                value = next(inputs, None)
+                if value is None:
+                    raise IntcodeError('Not enough input values')
+                write(m1, a1, value)
+            elif op == 4:
+                value = read(m1, a1)
+                if value is self.UNKNOWN:
+                    raise SymbolicDependenceError(
+                        f'Output at address {p} is unknown')
+                self.outputs.append(value)
+            elif op == 5 or op == 6:
+                condition = concrete(read(m1, a1), 'Jump condition')
+                if bool(condition) == (op == 5):
+                    next_p = concrete(read(m2, a2), 'Jump target')
+            elif op == 7 or op == 8:
+                x, y = read(m1, a1), read(m2, a2)
+                if isinstance(x, int) and isinstance(y, int):
+                    write(m3, a3, int(x < y if op == 7 else x == y))
+                else:
+                    write(m3, a3, self.UNKNOWN)
+            elif op == 9:
+                relative_base += concrete(read(m1, a1), 'Relative base')
+            elif op == 99:
+                return self.outputs
+            p = next_p
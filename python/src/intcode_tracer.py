@@ -0,0 +1,190 @@
+from intcode import Intcode, _IntcodeState
+from intcode_compiler import _BlockGenerator, _find_written_parameters
+
+
+# a loop head becomes hot after this many backward jumps to it
+HOT_LOOP_THRESHOLD = 50
+
+# recording gives up if the loop is not closed after this many instructions
+MAX_TRACE_LENGTH = 500
+
+
+class _TraceGenerator(_BlockGenerator):
+    """Generates Python source of a function executing a recorded loop.
+
+    The trace is the path of (address, next address) pairs executed in one
+    iteration of the loop. Conditional jumps become guards which leave the
+    function when a branch goes the other way than recorded, and outputs do
+    not end it. The generated function takes the same arguments as compiled
+    blocks, `out` returns True when execution has to pause.
+    """
+    def __init__(self, image, path, dynamic_cells):
+        super().__init__(image, path[0][0], dynamic_cells)
+        self.path = path
+
+    def code_guard(self):
+        return 'a in T'
+
+    def generate(self):
+        """Return the trace's source and baked cells, None if it is empty."""
+        p = self.entry
+        for p, taken_p in self.path:
+            instruction = self.decode(p)
+            if instruction is None:
+                break
+            op, next_p, m1, a1, m2, a2, _m3, _a3 = instruction
+            if op == 5 or op == 6:
+                condition = self.read(m1, a1)
+                target = self.read(m2, a2)
+                if taken_p == next_p:
+                    self.emit(f'if {"" if op == 5 else "not "}{condition}:')
+                    self.exit(target, 1)
+                else:
+                    self.emit(f'if {"not " if op == 5 else ""}{condition}:')
+                    self.exit(str(next_p), 1)
+                    if target != str(taken_p):
+                        self.emit(f'if {target} != {taken_p}:')
+                        self.exit(target, 1)
+            elif op == 4:
+                self.emit(f'v = {self.read(m1, a1)}')
+                self.flush()
+                self.emit('if out(v):')
+                self.emit(f'return {next_p}, rb', 1)
+            else:
+                self.straight(p, *instruction)
+            p = taken_p
+        if not self.lines:
+            return None
+        self.exit(str(p))
+        return self.finish(end=None), frozenset(self.baked_cells)
+
+
+class TracingIntcode(Intcode):
+    """Intcode which compiles its hot loops to Python as they run.
+
+    The interpreter counts jumps back to the start of straight-line code,
+    and exits from traces. When one address gets HOT_LOOP_THRESHOLD of them,
+    the path from there back to it (or to another trace) is recorded
+    instruction by instruction and compiled into a function. The function
+    runs the path from then on for as long as the branches go the same way.
+    Writes to the code of a trace discard it.
+
+    TracingIntcode is used exactly like Intcode.
+    """
+    def __init__(self, opcodes):
+        super().__init__(opcodes)
+        # loop head -> trace function
+        self._traces = {}
+        # loop head -> cells baked into its trace
+        self._trace_cells = {}
+        # cells baked into any trace, ever
+        self._traced_cells = set()
+        # loop head -> number of backward jumps to it
+        self._heat = {}
+        # loop heads which could not be recorded
+        self._untraceable = set()
+
+    def fork(self):
+        rtn = super().fork()
+        rtn._traces = self._traces.copy()
+        rtn._trace_cells = self._trace_cells.copy()
+        rtn._traced_cells = self._traced_cells.copy()
+        rtn._heat = self._heat.copy()
+        rtn._untraceable = self._untraceable.copy()
+        return rtn
+
+    def _invalidate(self, address):
+        super()._invalidate(address)
+        if address not in self._traced_cells:
+            return
+        for head, cells in list(self._trace_cells.items()):
+            if address in cells:
+                del self._trace_cells[head]
+                del self._traces[head]
+                self._untraceable.add(head)
+
+    def _record(self, read_input, write_output, pause_on_output):
+        """Record one iteration of the loop at the current address.
+
+        Recording stops when the loop closes or reaches the head of another
+        trace. Return the trace function, None if it did neither.
+        """
+        head = self._p
+        path = []
+        while len(path) < MAX_TRACE_LENGTH:
+            p = self._p
+            Intcode._execute(self, read_input, write_output, pause_on_output,
+                             max_instructions=1)
+            if self._state != _IntcodeState.SUSPENDED:
+                # paused or finished, try again next time
+                self._heat[head] = 0
+                return None
+            self._state = _IntcodeState.INTERMEDIATE
+            path.append((p, self._p))
+            if self._p == head or self._p in self._traces:
+                break
+        else:
+            self._untraceable.add(head)
+            return None
+
+        image = self.memory._contiguous_cells()
+        generator = _TraceGenerator(
+            image, path, _find_written_parameters(image))
+        generated = generator.generate()
+        if generated is None:
+            self._untraceable.add(head)
+            return None
+        source, cells = generated
+        namespace = {'T': cells}
+        exec(compile(source, f'<intcode trace {head}>', 'exec'), namespace)
+        self._traces[head] = namespace['block']
+        self._trace_cells[head] = cells
+        self._traced_cells.update(cells)
+        self._add_code_cells(cells)
+        return namespace['block']
+
+    def _execute(self, read_input, write_output, pause_on_output=False,
+                 max_instructions=None):
+        if max_instructions is not None:
+            return super()._execute(read_input, write_output, pause_on_output,
+                                    max_instructions=max_instructions)
+        memory = self.memory
+        traces = self._traces
+        heat = self._heat
+        running = _IntcodeState.INTERMEDIATE
+
+        def inp():
+            value = read_input()
+            if value is None:
+                self._state = _IntcodeState.WAITING_FOR_INPUT
+            return value
+
+        if pause_on_output:
+            def out(value):
+                self._output = value
+                self._state = _IntcodeState.OUTPUT_READY
+                return True
+        else:
+            def out(value):
+                write_output(value)
+
+        self._state = running
+        while self._state is running:
+            p = self._p
+            trace = traces.get(p)
+            if trace is not None:
+                self._p, self._relative_base = trace(
+                    memory, self._relative_base, inp, out)
+                # side exits of traces are potential trace heads, too
+                hot = True
+            else:
+                super()._execute(read_input, write_output, pause_on_output,
+                                 stop_at_branches=True)
+                hot = self._p <= p
+
+            new_p = self._p
+            if (hot and self._state is running and new_p not in traces
+                    and new_p not in self._untraceable):
+                heat[new_p] = heat.get(new_p, 0) + 1
+                if heat[new_p] >= HOT_LOOP_THRESHOLD:
+                    self._record(read_input, write_output, pause_on_output)
@@ -1,4 +1,4 @@
-from typing import Iterable, Dict, Tuple, Any, Set, Union, List
+from typing import Iterable, Dict, Tuple, Any, Set, Union, List, NamedTuple
 from enum import Enum
 from math import inf
 from itertools import count
@@ -7,26 +7,17 @@ from itertools import count
 Number = Union[int, float]
 
 
-class Coordinate:
-    def __init__(self, x : int, y : int):
-        self.x = x
-        self.y = y
+class Coordinate(NamedTuple):
+    """Position on a map, y grows downwards.
+
+    Being a tuple, it is hashed and compared without calling Python code.
+    """
+    x : int
+    y : int
 
     def __repr__(self) -> str:
         return f'<Coordinate {self.x}, {self.y}>'
 
-    def _data(self) -> Tuple[int, int]:
-        return self.x, self.y
-
-    def __iter__(self) -> Iterable[int]:
-        return iter(self._data())
-
-    def __eq__(self, other) -> bool:
-        return self._data() == other._data()
-
-    def __hash__(self) -> int:
-        return hash(self._data())
-
     def up(self) -> 'Coordinate':
         return Coordinate(self.x, self.y - 1)
 
@@ -39,6 +30,11 @@ class Coordinate:
     def right(self) -> 'Coordinate':
         return Coordinate(self.x + 1, self.y)
 
+    def neighbours(self) -> List['Coordinate']:
+        """Return the coordinates up, down, left and right of this one."""
+        x, y = self
+        return [Coordinate(x + dx, y + dy) for dx, dy in _NEIGHBOUR_OFFSETS]
+
 
 class Direction(Enum):
     NORTH = 'N'
@@ -47,20 +43,28 @@ class Direction(Enum):
     EAST = 'E'
 
     def move_coord(self, coord : Coordinate) -> Coordinate:
-        return {
-            Direction.NORTH: coord.up,
-            Direction.SOUTH: coord.down,
-            Direction.WEST: coord.left,
-            Direction.EAST: coord.right,
-        }[self]()
+        dx, dy = _DIRECTION_OFFSETS[self]
+        return Coordinate(coord.x + dx, coord.y + dy)
 
     def opposite(self) -> 'Direction':
-        return {
-            Direction.NORTH: Direction.SOUTH,
-            Direction.SOUTH: Direction.NORTH,
-            Direction.EAST:  Direction.WEST,
-            Direction.WEST:  Direction.EAST
-        }[self]
+        return _OPPOSITE_DIRECTIONS[self]
+
+
+_DIRECTION_OFFSETS = {
+    Direction.NORTH: (0, -1),
+    Direction.SOUTH: (0, 1),
+    Direction.WEST: (-1, 0),
+    Direction.EAST: (1, 0),
+}
+
+_NEIGHBOUR_OFFSETS = tuple(_DIRECTION_OFFSETS[d] for d in Direction)
+
+_OPPOSITE_DIRECTIONS = {
+    Direction.NORTH: Direction.SOUTH,
+    Direction.SOUTH: Direction.NORTH,
+    Direction.EAST:  Direction.WEST,
+    Direction.WEST:  Direction.EAST
+}
 
 
 class MapObject(Enum):
@@ -119,7 +123,7 @@ def find_distances(area : AreaMap, start_coord : Coordinate) -> Dict[Coordinate,
         for coord in leaf_coordinates:
             if area[coord] == MapObject.TARGET:
                 continue
-            for next_coord in [d.move_coord(coord) for d in Direction]:
+            for next_coord in coord.neighbours():
                 if next_coord in rtn:
                     continue
                 if area[next_coord] == MapObject.WALL:
@@ -8,18 +8,13 @@ class EmergencyHulPaintingProgram:
 
     def __init__(self, hul: dict):
         self.ic = Intcode(read_comma_separated_integers('day11input.txt'))
-        self.ic.start()
 
         self.hul = hul
         self.position = 0, 0
         self.direction_index = 0
 
-    def _read_value(self):
-        while True:
-            if self.ic.requires_input:
-                self.ic.write_input(self.hul.get(self.position, 0))
-            else:
-                return self.ic.read_output()
+    def _read_camera(self):
+        return self.hul.get(self.position, 0)
 
     def _rotate(self, value):
         rotation = 1 if value else -1
@@ -29,11 +24,18 @@ class EmergencyHulPaintingProgram:
         self.position = x + dx, y + dy
 
     def paint(self):
-        while not self.ic.finished:
-            color = self._read_value()
-            self.hul[self.position] = color
-            rotation = self._read_value()
-            self._rotate(rotation)
+        instruction = []
+
+        def execute(value):
+            instruction.append(value)
+            if len(instruction) == 2:
+                color, rotation = instruction
+                self.hul[self.position] = color
+                self._rotate(rotation)
+                instruction.clear()
+
+        self.ic.run(self._read_camera, execute)
+        assert self.ic.finished
 
 
 def puzzle1():
@@ -1,6 +1,6 @@
 from enum import Enum
 
-from intcode import Intcode
+from intcode_compiler import CompiledIntcode
 from input_reader import read_comma_separated_integers
 
 
@@ -29,32 +29,28 @@ class Joystick(Enum):
 
 class ArcadeCabinet:
     def __init__(self):
-        self.ic = Intcode(read_comma_separated_integers('day13input.txt'))
+        self.ic = CompiledIntcode(read_comma_separated_integers('day13input.txt'))
         self.screen = {}
         self.score = 0
+        self._tile_data = []
 
     def set_number_of_quarters(self, value):
         self.ic.memory[0] = value
 
-    def read_tile_from_ic(self):
-        data = []
-        while len(data) < 3 and not self.ic.finished:
-            if self.ic.requires_input:
-                self.ic.write_input(self.joystick_value)
-            else:
-                data.append(self.ic.read_output())
-
+    def read_tile_from_ic(self, value):
+        data = self._tile_data
+        data.append(value)
         if len(data) == 3:
-            return tuple(data)
-
-    def run(self):
-        self.ic.start()
-        while None is not (tile := self.read_tile_from_ic()):
-            x, y, tile_id = tile
+            x, y, tile_id = data
+            data.clear()
             if (x, y) == (-1, 0):
                 self.score = tile_id
-                continue
-            self.screen[(x, y)] = TileId(tile_id)
+            else:
+                self.screen[(x, y)] = TileId(tile_id)
+
+    def run(self):
+        self.ic.run(lambda: self.joystick_value, self.read_tile_from_ic)
+        assert self.ic.finished
 
     @property
     def joystick_value(self):
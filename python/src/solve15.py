@@ -13,9 +13,14 @@ class Status(Enum):
 
 
 class DroidRemote:
-    def __init__(self):
-        self.ic = Intcode(read_comma_separated_integers('day15input.txt'))
-        self.ic.start()
+    def __init__(self, ic=None):
+        if ic is None:
+            ic = Intcode(read_comma_separated_integers('day15input.txt'))
+            ic.start()
+        self.ic = ic
+
+    def fork(self):
+        return DroidRemote(self.ic.fork())
 
     def move(self, direction):
         command = {
@@ -44,7 +49,8 @@ def explore_depth_first(coord, area, droid, distance, distances=None):
             continue
         if distances.get(next_coord, float('inf')) <= distance + 1:
             continue
-        status = droid.move(direction)
+        next_droid = droid.fork()
+        status = next_droid.move(direction)
         distances[next_coord] = distance + 1
         if status == Status.WALL:
             area[next_coord] = MapObject.WALL
@@ -53,8 +59,7 @@ def explore_depth_first(coord, area, droid, distance, distances=None):
                 area[next_coord] = MapObject.TARGET
             else:
                 area[next_coord] = MapObject.EMPTY
-            explore_depth_first(next_coord, area, droid, distance + 1, distances)
-            droid.move(direction.opposite())
+            explore_depth_first(next_coord, area, next_droid, distance + 1, distances)
     return distances
 
 
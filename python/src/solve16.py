@@ -1,7 +1,7 @@
 from itertools import count
 import numpy as np
 
-from input_reader import read_digits
+from input_reader import read_digit_array
 
 
 base_pluses = np.array([False, True, False, False])
@@ -25,7 +25,7 @@ def calculate_fft_phase(input):
 
 
 def puzzle1():
-    signal = np.fromiter(read_digits('day16input.txt'), dtype=np.int64)
+    signal = read_digit_array('day16input.txt').astype(np.int64)
     for i in range(100):
         signal = calculate_fft_phase(signal)
     return ''.join(str(x) for x in signal[:8])
@@ -38,7 +38,7 @@ def calculate_sub_fft_phase(input):
 def puzzle2():
     from input_reader import TestInput
 
-    input = np.fromiter(read_digits('day16input.txt'), dtype=np.int64)
+    input = read_digit_array('day16input.txt').astype(np.int64)
     offset = (input[:7] * np.fromiter((10**i for i in range(6, -1, -1)), dtype=np.int64)).sum()
     signal = np.tile(input, 10_000)
     if offset > len(signal) // 2:
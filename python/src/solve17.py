@@ -1,55 +1,38 @@
 from itertools import product
 
 from input_reader import read_comma_separated_integers
-from intcode import Intcode
+from intcode_ascii import AsciiIntcode
+from intcode_compiler import CompiledIntcode
 
 
 class AftScaffoldingControlAndInformationInterface:
     def __init__(self, wake_vacuum_robot_up=False):
-        opcodes = read_comma_separated_integers('day17input.txt')
+        opcodes = list(read_comma_separated_integers('day17input.txt'))
         if wake_vacuum_robot_up:
             assert opcodes[0] == 1
             opcodes[0] = 2
-        self.ic = Intcode(opcodes)
-        self.ic.start()
+        self.ascii = AsciiIntcode(CompiledIntcode(opcodes))
 
     def scan_cameras(self):
-        line = []
-        while True:
-            while (ch := self.ic.read_output()) != 10:
-                if ch is None:
-                    break
-                line.append(chr(ch))
-            if line:
-                yield ''.join(line)
-                line = []
-            else:
-                return
+        while line := self.ascii.read_line():
+            yield line
 
     def provide_routines(self, main_routine, a, b, c, live_video=False):
-        assert self.read_line() == 'Main:'
-        self.provide_input(main_routine)
-        assert self.read_line() == 'Function A:'
-        self.provide_input(a)
-        assert self.read_line() == 'Function B:'
-        self.provide_input(b)
-        assert self.read_line() == 'Function C:'
-        self.provide_input(c)
-        assert self.read_line() == 'Continuous video feed?'
-        self.provide_input('y' if live_video else 'n')
-
-
-
-    def read_line(self):
-        rtn = []
-        while (ch := self.ic.read_output()) != 10:
-            rtn.append(chr(ch))
-        return ''.join(rtn)
-
-    def provide_input(self, s):
-        for ch in s:
-            self.ic.write_input(ord(ch))
-        self.ic.write_input(10)
+        assert self.ascii.read_line() == 'Main:'
+        self.ascii.write_line(main_routine)
+        assert self.ascii.read_line() == 'Function A:'
+        self.ascii.write_line(a)
+        assert self.ascii.read_line() == 'Function B:'
+        self.ascii.write_line(b)
+        assert self.ascii.read_line() == 'Function C:'
+        self.ascii.write_line(c)
+        assert self.ascii.read_line() == 'Continuous video feed?'
+        self.ascii.write_line('y' if live_video else 'n')
+
+    def collected_dust(self):
+        self.ascii.read()
+        assert self.ascii.finished
+        return self.ascii.values[0]
 
     def find_intersections(self):
         scaffolds = list(self.scan_cameras())
@@ -196,13 +179,7 @@ def puzzle2():
 
     main, a, b, c = [routine for routine in caculate_movement_routines(moves)]
     ascii.provide_routines(main, a, b, c)
-    while not ascii.ic.finished:
-        ch = ascii.ic.read_output()
-        if ch < 256:
-            #print(chr(ch), end='')
-            pass
-        else:
-            return ch
+    return ascii.collected_dust()
 
 
 if __name__ == "__main__":
@@ -2,8 +2,11 @@ from typing import (
     Tuple, FrozenSet, Optional, Dict, Iterator,
     Union, Callable, Iterable, Any)
 from math import inf
+from functools import lru_cache
 
-from input_reader import read_labyrinth
+from input_reader import (
+    read_grid, grid_characters, grid_coordinates, cached_on_disk,
+    FilenameOrTestInput)
 from labyrinth import (
     find_all_distances, AreaMap, Coordinate, MapObject, DistanceGraph)
 
@@ -19,7 +22,7 @@ KEY_TO_DOOR_CHAR = dict(zip(KEY_CHARS, DOOR_CHARS))
 class ConnectionToNode:
     def __init__(self, node_id, obatacle_ids : Iterable, distance : int):
         self.node_id = node_id
-        self.obatacle_ids = set(obatacle_ids)
+        self.obatacle_ids = frozenset(obatacle_ids)
         self.distance = distance
 
 
@@ -65,16 +68,64 @@ class DistanceGraphWithObstacles:
                     rtn.get(connection.node_id, inf), connection.distance)
         return rtn
 
+    def to_data(self) -> tuple:
+        """Return the graph as plain data, to be cached.
+
+        That is a tuple of (x, y) of all coordinates in the graph, a tuple of
+        all distinct obstacle sets as coordinate indices, and for every node
+        its index and a flat tuple of (neighbour index, obstacle set index,
+        distance) triples.
+        """
+        coordinate_indices = {}
+        obstacle_indices = {}
+        for node_id, connections in self._nodes.items():
+            coordinate_indices.setdefault(node_id, len(coordinate_indices))
+            for c in connections:
+                for coord in (c.node_id, *c.obatacle_ids):
+                    coordinate_indices.setdefault(coord, len(coordinate_indices))
+                obstacle_indices.setdefault(c.obatacle_ids, len(obstacle_indices))
+
+        def triples(connections):
+            for c in connections:
+                yield coordinate_indices[c.node_id]
+                yield obstacle_indices[c.obatacle_ids]
+                yield c.distance
+
+        return (
+            tuple(tuple(coord) for coord in coordinate_indices),
+            tuple(tuple(coordinate_indices[coord] for coord in obstacles)
+                  for obstacles in obstacle_indices),
+            tuple((coordinate_indices[node_id], tuple(triples(connections)))
+                  for node_id, connections in self._nodes.items()))
+
+    @classmethod
+    def from_data(cls, data : tuple, coordinate : Callable[[tuple], Coordinate]
+                  ) -> 'DistanceGraphWithObstacles':
+        """Rebuild the graph from to_data, converting (x, y) with coordinate."""
+        coordinates, obstacle_sets, nodes = data
+        coordinates = [coordinate(xy) for xy in coordinates]
+        # connections with the same obstacles share the set
+        obstacle_sets = [frozenset(map(coordinates.__getitem__, obstacles))
+                         for obstacles in obstacle_sets]
+
+        rtn = cls.__new__(cls)
+        rtn._nodes = {
+            coordinates[node]: [
+                ConnectionToNode(coordinates[connections[i]],
+                                 obstacle_sets[connections[i + 1]],
+                                 connections[i + 2])
+                for i in range(0, len(connections), 3)]
+            for node, connections in nodes}
+        return rtn
 
 
-def read_area_map() -> Tuple[AreaMap, FrozenSet[Coordinate],
+def read_area_map(filename : FilenameOrTestInput = 'day18input.txt'
+                  ) -> Tuple[AreaMap, FrozenSet[Coordinate],
                              Dict[Coordinate, Coordinate], Coordinate]:
-    input_map = read_labyrinth('day18input.txt')
+    input_map = read_grid(filename)
 
-    keys = {ch: (x, y) for (x, y), ch in input_map.items()
-            if ch in KEY_CHARS}
-    doors = {ch: (x, y) for (x, y), ch in input_map.items()
-            if ch in DOOR_CHARS}
+    keys = {ch: xy for xy, ch in grid_characters(input_map, KEY_CHARS).items()}
+    doors = {ch: xy for xy, ch in grid_characters(input_map, DOOR_CHARS).items()}
 
     key_to_door_coords = {
         Coordinate(x, y): Coordinate(*doors[KEY_TO_DOOR_CHAR[key_ch]])
@@ -82,23 +133,14 @@ def read_area_map() -> Tuple[AreaMap, FrozenSet[Coordinate],
         if KEY_TO_DOOR_CHAR[key_ch] in doors
         }
 
-    starting_position, = [Coordinate(x, y) for (x, y), ch in input_map.items()
-                          if ch == '@']
+    starting_position, = [Coordinate(x, y) for x, y
+                          in grid_coordinates(input_map, '@').tolist()]
 
-    def get_map_object(x, y, ch):
-        if (x, y) in keys.values():
-            return MapObject.EMPTY
-        elif (x, y) in doors.values():
-            return MapObject.EMPTY
-        else:
-            return {
-                '#': MapObject.WALL,
-                '.': MapObject.EMPTY,
-                '@': MapObject.EMPTY
-            }[ch]
-
-    area = AreaMap({Coordinate(x, y): get_map_object(x, y, ch)
-                    for (x, y), ch in input_map.items()})
+    # cells which are not in the map are walls
+    area = AreaMap({
+        Coordinate(x, y): MapObject.EMPTY
+        for x, y in grid_coordinates(
+            input_map, '.@' + KEY_CHARS + DOOR_CHARS).tolist()})
 
     for door_x_y in doors.values():
         if Coordinate(*door_x_y) not in key_to_door_coords.values():
@@ -184,8 +226,14 @@ class FastestSolutionFinder:
         return best_found_distance
 
 
-def solve_puzzle(multiple_entrances=False):
-    area, key_coords, key_to_door_coords, starting_position = read_area_map()
+@cached_on_disk
+def read_key_graph(filename : FilenameOrTestInput, multiple_entrances : bool):
+    """Build the graph of distances between keys, doors and entrances.
+
+    Returns starting positions, key to door coordinates and the graph as
+    plain data (see DistanceGraphWithObstacles.to_data), to be cached.
+    """
+    area, key_coords, key_to_door_coords, starting_position = read_area_map(filename)
 
     if multiple_entrances:
         starting_positions = (
@@ -209,6 +257,26 @@ def solve_puzzle(multiple_entrances=False):
         return coord in door_coords
     distances_graph_with_obstacles = DistanceGraphWithObstacles(distances_graph, is_obstacle)
 
+    return (tuple(tuple(p) for p in starting_positions),
+            tuple((tuple(key), tuple(door))
+                  for key, door in key_to_door_coords.items()),
+            distances_graph_with_obstacles.to_data())
+
+
+def solve_puzzle(multiple_entrances=False):
+    starting_positions, key_to_door_coords, graph_data = read_key_graph(
+        'day18input.txt', multiple_entrances)
+
+    # The search is much faster with one Coordinate object per position,
+    # because sets and dicts compare identical objects without their contents
+    coordinate = lru_cache(maxsize=None)(lambda xy: Coordinate(*xy))
+
+    starting_positions = tuple(coordinate(p) for p in starting_positions)
+    key_to_door_coords = {coordinate(key): coordinate(door)
+                          for key, door in key_to_door_coords}
+    distances_graph_with_obstacles = DistanceGraphWithObstacles.from_data(
+        graph_data, coordinate)
+
     solution_finder = FastestSolutionFinder(
         distances_graph_with_obstacles, key_to_door_coords)
 
@@ -1,13 +1,16 @@
 from itertools import chain, product, count
 
 
-from input_reader import read_comma_separated_integers
-from intcode import Intcode
+from input_reader import read_comma_separated_integers, read_integer_array
+from intcode import IntcodePrototype
+from intcode_batch import IntcodeBatch
 
 
 class TractorBeamTester:
     def __init__(self, max_coord):
         self.opcodes = read_comma_separated_integers('day19input.txt')
+        self.prototype = IntcodePrototype(self.opcodes, warm_up=True)
+        self.opcode_array = read_integer_array('day19input.txt')
         self.max_coord = max_coord
         self.cache = {}
 
@@ -16,12 +19,23 @@ class TractorBeamTester:
             self.cache[x, y] = self._test_coordinates(x, y)
         return self.cache[x, y]
 
+    def test_many_coordinates(self, coordinates):
+        coordinates = [(x, y) for x, y in coordinates
+                       if (x, y) not in self.cache]
+        for x, y in coordinates:
+            assert 0 <= x <= self.max_coord
+            assert 0 <= y <= self.max_coord
+
+        batch = IntcodeBatch(self.opcode_array, inputs=coordinates)
+        batch.run()
+        for coord, (output,) in zip(coordinates, batch.outputs):
+            self.cache[coord] = {1: True, 0: False}[output]
+
     def _test_coordinates(self, x, y):
         assert 0 <= x <= self.max_coord
         assert 0 <= y <= self.max_coord
 
-        ic = Intcode(self.opcodes)
-        ic.start()
+        ic = self.prototype.instantiate()
         ic.write_input(x)
         ic.write_input(y)
         return {1: True, 0: False}[ic.read_output()]
@@ -47,27 +61,9 @@ class TractorBeamTester:
 
 def puzzle1():
     tester = TractorBeamTester(50)
-
-    x_sweep = ((x, 49) for x in range(49, -1, -1))
-    y_sweep = ((49, y) for y in range(50))
-    sweep = chain(y_sweep, x_sweep)
-
-    test_run = [(x, y) for x, y in sweep if tester.test_coordinates(x, y)]
-
-    first_ray_x, first_ray_y = test_run[0]
-    last_ray_x, last_ray_y = test_run[-1]
-
-    total_count = 0
-    for x in range(first_ray_x+1):
-        first_y = tester.get_first_y(x, True, first_ray_y * x // first_ray_x - 1)
-        if first_y is None:
-            continue
-        last_y = tester.get_first_y(x, False, last_ray_y * x // last_ray_x + 1)
-        if last_y is None:
-            last_y = 50
-        total_count += last_y - first_y
-
-    return total_count
+    coordinates = list(product(range(50), range(50)))
+    tester.test_many_coordinates(coordinates)
+    return sum(tester.test_coordinates(x, y) for x, y in coordinates)
 
 
 def bisect(low, high, test):
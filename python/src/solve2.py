@@ -1,19 +1,40 @@
-from input_reader import read_comma_separated_integers
-from intcode import Intcode
+from itertools import product
+
+import numpy as np
+
+from input_reader import read_comma_separated_integers, read_integer_array
+from intcode import IntcodePrototype
+from intcode_batch import IntcodeBatch
+from intcode_symbolic import SymbolicIntcode, SymbolicDependenceError
 
 
 class GravityAssistProgram:
     def __init__(self):
         self._codes = read_comma_separated_integers('day2input.txt')
+        self._prototype = IntcodePrototype(self._codes)
+        self._code_array = read_integer_array('day2input.txt')
 
     def run(self, noun, verb):
-        c = Intcode(self._codes)
+        c = self._prototype.instantiate()
         c.memory[1] = noun
         c.memory[2] = verb
         c.start()
         assert c.finished
         return c.memory[0]
 
+    def run_many(self, nouns, verbs):
+        batch = IntcodeBatch(self._code_array, count=len(nouns),
+                             patches={1: nouns, 2: verbs})
+        batch.run()
+        assert batch.finished.all()
+        return batch.memory[:, 0]
+
+    def result_expression(self):
+        """Return the result as a Polynomial of symbols noun and verb."""
+        ic = SymbolicIntcode(self._codes, {1: 'noun', 2: 'verb'})
+        ic.run()
+        return ic.expression(0)
+
 
 def puzzle1():
     p = GravityAssistProgram()
@@ -23,10 +44,18 @@ def puzzle1():
 def find_result(result_value):
     p = GravityAssistProgram()
 
-    for noun in range(0, 100):
-        for verb in range(0, 100):
-            if p.run(noun, verb) == result_value:
-                return noun, verb
+    nouns, verbs = np.array(list(product(range(100), range(100)))).T
+    try:
+        expression = p.result_expression()
+        # Python integers, coefficients may be too large for 64 bits
+        values = {'noun': nouns.astype(object), 'verb': verbs.astype(object)}
+        # a constant does not come out as an array
+        results = np.broadcast_to(expression.evaluate(values), nouns.shape)
+    except SymbolicDependenceError:
+        results = p.run_many(nouns, verbs)
+    matches = np.flatnonzero(results == result_value)
+    if len(matches):
+        return int(nouns[matches[0]]), int(verbs[matches[0]])
 
 
 def puzzle2():
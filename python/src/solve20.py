@@ -2,7 +2,9 @@ from typing import Optional, Iterable, Tuple
 from itertools import chain, count
 from math import inf
 
-from input_reader import read_labyrinth, TestInput
+import numpy as np
+
+from input_reader import read_grid, grid_characters, TestInput
 from labyrinth import (
     find_all_distances, AreaMap, Coordinate, MapObject, DistanceGraphBase,
     SymmetricalGraphMixin)
@@ -15,8 +17,11 @@ def iter_neightbouring_coordinates(x, y):
     yield (x, y - 1)
 
 
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
 def detect_portals(raw_lab : dict):
-    LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    """Find portals in a dict of the coordinates of letters and passages."""
     portals_by_coord = {}
     for (x, y), ch in raw_lab.items():
         if ch in LETTERS:
@@ -38,9 +43,6 @@ def detect_portals(raw_lab : dict):
                 if raw_lab.get(xy) == '.']
             portals_by_coord[portal_coord] = portal_name
 
-        else:
-            assert ch in ' #.'
-
     portals_by_name = {}
     for xy, name in portals_by_coord.items():
         portals_by_name.setdefault(name, [])
@@ -49,11 +51,14 @@ def detect_portals(raw_lab : dict):
 
 
 def parse_input():
-    raw_lab = read_labyrinth('day20input.txt')
+    grid = read_grid('day20input.txt')
+    assert set(np.unique(grid).tobytes().decode()) <= set(LETTERS + ' #.')
+    raw_lab = grid_characters(grid, LETTERS + '.')
     portals = detect_portals(raw_lab)
+    # cells which are not in the map are walls
     area = AreaMap({
-        Coordinate(*xy): MapObject.EMPTY if ch == '.' else MapObject.WALL
-        for xy, ch in raw_lab.items()})
+        Coordinate(*xy): MapObject.EMPTY
+        for xy, ch in raw_lab.items() if ch == '.'})
 
     return area, portals
 
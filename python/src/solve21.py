@@ -1,32 +1,23 @@
 from input_reader import read_comma_separated_integers
-from intcode import Intcode
+from intcode_ascii import AsciiIntcode
+from intcode_tracer import TracingIntcode
 
 
 class SpringDroidProgrammer:
     def __init__(self):
-        self.ic = Intcode(read_comma_separated_integers('day21input.txt'))
-        self.ic.start()
+        self.ascii = AsciiIntcode(
+            TracingIntcode(read_comma_separated_integers('day21input.txt')))
 
     def read_prompt(self):
-        rtn = ''
-        ch = self.ic.read_output()
-        while ch != 10:
-            rtn += chr(ch)
-            ch = self.ic.read_output()
-        return rtn
+        return self.ascii.read_line()
 
     def write_command(self, command):
-        for ch in command:
-            self.ic.write_input(ord(ch))
-        self.ic.write_input(10)
+        self.ascii.write_line(command)
 
     def read_output(self):
-        while not self.ic.finished:
-            ch = self.ic.read_output()
-            if ch < 256:
-                pass
-            else:
-                return ch
+        self.ascii.read()
+        if self.ascii.values:
+            return self.ascii.values[0]
 
     def program(self, source):
         self.read_prompt()
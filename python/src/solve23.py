@@ -1,68 +1,104 @@
 from collections import deque
+from functools import partial
 
 from input_reader import read_comma_separated_integers
-from intcode import Intcode
+from intcode import IntcodePrototype
+from intcode_scheduler import IntcodeScheduler
 
 
 class NetworkInterfaceController:
-    def __init__(self, address):
+    def __init__(self, address, prototype, scheduler, network):
         self.address = address
-        self.input_q = deque()
-        self._idle_counter = 0
-        self.ic = Intcode(read_comma_separated_integers('day23input.txt'))
-        self.ic.start()
-        self.ic.write_input(address)
+        self.input_q = deque([address])
+        self.ic = prototype.instantiate()
+        self.task = scheduler.add(
+            self.ic, self._read_input, partial(self._write_output, network))
+        self.packets_sent = 0
+        self.packets_received = 0
+        self._packet = []
+        # the NIC got -1 and did nothing since, so it waits for a packet
+        self._starving = False
 
     def __repr__(self):
         return f'<NIC {self.address!r}>'
 
-    def communicate(self, network):
-        if self.ic.requires_input:
-            if self.input_q:
-                self.ic.write_input(self.input_q.popleft())
-                self._idle_counter = 0
-            else:
-                self.ic.write_input(-1)
-                self._idle_counter += 1
-        else:
-            # if it is not taking an input, assume it has 3 outputs
-            addr = self.ic.read_output()
-            x = self.ic.read_output()
-            y = self.ic.read_output()
+    def _read_input(self):
+        if self.input_q:
+            self._starving = False
+            return self.input_q.popleft()
+        if self._starving:
+            return None
+        self._starving = True
+        return -1
+
+    def _write_output(self, network, value):
+        self._starving = False
+        self._packet.append(value)
+        if len(self._packet) == 3:
+            addr, x, y = self._packet
+            self._packet.clear()
+            self.packets_sent += 1
             network.transmit(self.address, addr, x, y)
-            self._idle_counter = 0
 
     def receive(self, x, y):
+        self.packets_received += 1
         self.input_q.append(x)
         self.input_q.append(y)
 
-    def is_idle(self):
-        return self._idle_counter > 50
+    @property
+    def stats(self):
+        return {
+            'packets_sent': self.packets_sent,
+            'packets_received': self.packets_received,
+            'instructions': self.task.instructions,
+        }
 
 
 class NotAlwaysTransmitting:
     def __init__(self):
         self.x = None
         self.y = None
+        self.packets_sent = 0
+        self.packets_received = 0
 
     def receive(self, x, y):
+        self.packets_received += 1
         self.x = x
         self.y = y
 
-    def is_idle(self):
-        return True
+    def wake(self, network):
+        assert self.x is not None, "the network is idle before it started"
+        self.packets_sent += 1
+        network.transmit(255, 0, self.x, self.y)
 
-    def communicate(self, network):
-        if network.is_idle():
-            network.transmit(255, 0, self.x, self.y)
+    @property
+    def stats(self):
+        return {
+            'packets_sent': self.packets_sent,
+            'packets_received': self.packets_received,
+            'instructions': 0,
+        }
 
 
 class Network:
-    def __init__(self):
+    """Network of NICs, running only those which have work to do.
+
+    NICs are run by an IntcodeScheduler, in turns of a limited number of
+    instructions. A NIC which asks for a packet twice in a row with an empty
+    queue (getting -1 the first time) is blocked until a packet is sent to
+    it. When all NICs are blocked, the network is idle and the NAT is woken
+    up.
+    """
+    def __init__(self, quantum=1000):
+        prototype = IntcodePrototype(
+            read_comma_separated_integers('day23input.txt'))
+        self.scheduler = IntcodeScheduler(quantum)
         self.computers = {
-            address: NetworkInterfaceController(address)
+            address: NetworkInterfaceController(
+                address, prototype, self.scheduler, self)
             for address in range(50)}
-        self.computers[255] = NotAlwaysTransmitting()
+        self.nat = NotAlwaysTransmitting()
+        self.computers[255] = self.nat
         self._observers = []
 
     def observe_transmissions(self, callback):
@@ -71,15 +107,20 @@ class Network:
 
     def transmit(self, sender, recipient, x, y):
         self.computers[recipient].receive(x, y)
+        if recipient != 255:
+            self.scheduler.wake(self.computers[recipient].task)
         for observer in self._observers:
             observer(sender, recipient, x, y)
 
-    def loop(self):
-        for computer in self.computers.values():
-            computer.communicate(self)
+    def run_until_idle(self):
+        """Run NICs until all are waiting for packets, then wake the NAT."""
+        self.scheduler.run()
+        self.nat.wake(self)
 
-    def is_idle(self):
-        return all(c.is_idle() for c in self.computers.values())
+    def stats(self):
+        """Return a dict of packet and instruction counts per address."""
+        return {address: computer.stats
+                for address, computer in self.computers.items()}
 
 
 def puzzle1():
@@ -94,7 +135,7 @@ def puzzle1():
     network.observe_transmissions(observe_255_y)
 
     while result is None:
-        network.loop()
+        network.run_until_idle()
     return result
 
 
@@ -114,7 +155,7 @@ def puzzle2():
     network.observe_transmissions(observe_255_y)
 
     while double_y is None:
-        network.loop()
+        network.run_until_idle()
     return double_y
 
 
@@ -4,7 +4,8 @@ from typing import List, Tuple, Set, Dict
 from dataclasses import dataclass
 
 from input_reader import read_comma_separated_integers
-from intcode import Intcode
+from intcode_ascii import AsciiIntcode
+from intcode_compiler import CompiledIntcode
 
 
 @dataclass
@@ -32,13 +33,13 @@ class PasswordFound(Exception):
 
 class Robot:
     def __init__(self):
-        self.ic = Intcode(read_comma_separated_integers('day25input.txt'))
-        self.ic.start()
+        self.ascii = AsciiIntcode(
+            CompiledIntcode(read_comma_separated_integers('day25input.txt')))
 
     def run_manually(self):
         print(self._read_output(), end='')
 
-        while self.ic.requires_input:
+        while not self.ascii.finished:
             txt = input()
             self.write_input(f'{txt}\n')
             print(self._read_output(), end='')
@@ -66,14 +67,10 @@ class Robot:
             return output['Items in your inventory:']
 
     def write_input(self, s):
-        for ch in s:
-            self.ic.write_input(ord(ch))
+        self.ascii.write(s)
 
     def _read_output(self):
-        rtn = []
-        while self.ic.has_output:
-            rtn.append(chr(self.ic.read_output()))
-        return ''.join(rtn)
+        return self.ascii.read()
 
     def parse_output(self):
         rtn = { 'lines': [] }
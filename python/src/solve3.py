@@ -1,62 +1,153 @@
-from input_reader import read_directions_per_line
-
-
-class Coordinate:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-
-    def __eq__(self, other):
-        return self.__data() == other.__data()
-
-    def __hash__(self):
-        return hash(self.__data())
-
-    def __data(self):
-        return (self.x, self.y)
-
-    def next_coord(self, direction):
-        dx, dy = {
-            'U': (0, 1),
-            'D': (0, -1),
-            'R': (1, 0),
-            'L': (-1, 0)
-        }[direction]
-
-        return Coordinate(self.x + dx, self.y + dy)
-
-    def distance(self, other):
-        return abs(self.x - other.x) + abs(self.y - other.y)
-
-
-def get_wire_coordinates(movements, start):
-    coord = start
-    yield coord
-    for direction in movements:
-        coord = coord.next_coord(direction)
-        yield coord
+from typing import NamedTuple, Iterable, Tuple, Dict, List
+from bisect import bisect_left, bisect_right, insort
+from math import inf
+
+from input_reader import read_segments_per_line
+
+
+DIRECTIONS = {
+    'U': (0, 1),
+    'D': (0, -1),
+    'R': (1, 0),
+    'L': (-1, 0)
+}
+
+
+class Segment(NamedTuple):
+    x : int
+    y : int
+    dx : int
+    dy : int
+    length : int
+    # steps along the wire before this segment
+    steps : int
+
+    @property
+    def end(self) -> Tuple[int, int]:
+        return (self.x + self.dx * self.length, self.y + self.dy * self.length)
+
+    def steps_to(self, x, y) -> int:
+        return self.steps + abs(x - self.x) + abs(y - self.y)
+
+    @property
+    def is_horizontal(self) -> bool:
+        return self.dy == 0
+
+    def span(self) -> Tuple[int, int]:
+        """Lowest and highest coordinate along the segment's axis."""
+        start = self.x if self.is_horizontal else self.y
+        end = start + (self.dx + self.dy) * self.length
+        return min(start, end), max(start, end)
+
+
+class Wire:
+    """A wire as a polyline of axis-aligned segments."""
+    def __init__(self, runs : Iterable[Tuple[str, int]], start=(0, 0)):
+        self.segments = []
+        x, y = start
+        steps = 0
+        for direction, length in runs:
+            dx, dy = DIRECTIONS[direction]
+            segment = Segment(x, y, dx, dy, length, steps)
+            self.segments.append(segment)
+            x, y = segment.end
+            steps += length
+
+
+Crossings = Dict[Tuple[int, int], Dict[int, int]]
+
+
+def _record(crossings : Crossings, x, y, wire_index, segment):
+    steps = crossings.setdefault((x, y), {})
+    steps[wire_index] = min(steps.get(wire_index, inf), segment.steps_to(x, y))
+
+
+def _find_perpendicular_crossings(segments, crossings : Crossings):
+    """Sweep a vertical line over the x axis.
+
+    Horizontal segments are in the interval index (a list sorted by y)
+    while the line is over them, and each vertical segment looks up the
+    ones within its y span.
+    """
+    events = []
+    for serial, (wire_index, segment) in enumerate(segments):
+        low, high = segment.span()
+        if segment.is_horizontal:
+            events.append((low, 0, serial))
+            events.append((high, 2, serial))
+        else:
+            events.append((segment.x, 1, serial))
+    events.sort()
+
+    active = []
+    for x, kind, serial in events:
+        wire_index, segment = segments[serial]
+        if kind == 0:
+            insort(active, (segment.y, serial))
+        elif kind == 2:
+            active.remove((segment.y, serial))
+        else:
+            low, high = segment.span()
+            first = bisect_left(active, (low, -1))
+            last = bisect_right(active, (high, len(segments)))
+            for y, other_serial in active[first:last]:
+                other_wire_index, other_segment = segments[other_serial]
+                if other_wire_index != wire_index:
+                    _record(crossings, x, y, wire_index, segment)
+                    _record(crossings, x, y, other_wire_index, other_segment)
+
+
+def _find_collinear_crossings(segments, crossings : Crossings):
+    """Find overlaps of segments lying on the same line."""
+    lines = {}
+    for wire_index, segment in segments:
+        line = (segment.is_horizontal,
+                segment.y if segment.is_horizontal else segment.x)
+        lines.setdefault(line, []).append((segment.span(), wire_index, segment))
+
+    for (is_horizontal, position), line_segments in lines.items():
+        line_segments.sort(key=lambda item: item[0])
+        active = []
+        for (low, high), wire_index, segment in line_segments:
+            active = [item for item in active if item[0][1] >= low]
+            for (_other_low, other_high), other_wire_index, other_segment in active:
+                if other_wire_index == wire_index:
+                    continue
+                for i in range(low, min(high, other_high) + 1):
+                    x, y = (i, position) if is_horizontal else (position, i)
+                    _record(crossings, x, y, wire_index, segment)
+                    _record(crossings, x, y, other_wire_index, other_segment)
+            active.append(((low, high), wire_index, segment))
+
+
+def find_crossings(wires : List[Wire]) -> Crossings:
+    """Find points where two or more wires meet.
+
+    Returns a dict of points to dicts of the fewest steps each wire meeting
+    there takes to reach the point, keyed by the index of the wire.
+    """
+    segments = [(wire_index, segment)
+                for wire_index, wire in enumerate(wires)
+                for segment in wire.segments]
+    crossings = {}
+    _find_perpendicular_crossings(segments, crossings)
+    _find_collinear_crossings(segments, crossings)
+    return crossings
+
+
+def read_wire_crossings():
+    wires = list(map(Wire, read_segments_per_line('day3input.txt')))
+    crossings = find_crossings(wires)
+    crossings.pop((0, 0), None)
+    return crossings
 
 
 def puzzle1():
-    zero = Coordinate(0,0)
-    wire_1_moves, wire_2_moves = read_directions_per_line('day3input.txt')
-    wire_1_coords = set(get_wire_coordinates(wire_1_moves, zero))
-    wire_2_coords = set(get_wire_coordinates(wire_2_moves, zero))
-    intersections = (wire_1_coords & wire_2_coords) - {zero}
-    return min(zero.distance(c) for c in intersections)
+    return min(abs(x) + abs(y) for x, y in read_wire_crossings())
 
 
 def puzzle2():
-    zero = Coordinate(0,0)
-    wire_1_moves, wire_2_moves = read_directions_per_line('day3input.txt')
-    wire_1_coords = {}
-    for distance, coord in enumerate(get_wire_coordinates(wire_1_moves, zero)):
-        wire_1_coords.setdefault(coord, distance)
-    wire_2_coords = {}
-    for distance, coord in enumerate(get_wire_coordinates(wire_2_moves, zero)):
-        wire_2_coords.setdefault(coord, distance)
-    intersections = (set(wire_1_coords) & set(wire_2_coords)) - {zero}
-    return min(wire_1_coords[c] + wire_2_coords[c] for c in intersections)
+    return min(sum(steps.values()) for steps in read_wire_crossings().values())
 
 
 if __name__ == "__main__":
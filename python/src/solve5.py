@@ -1,3 +1,5 @@
+from functools import partial
+
 from intcode import Intcode
 from input_reader import read_comma_separated_integers
 
@@ -7,11 +9,10 @@ class DiagnosticProgram:
         self.ic = Intcode(read_comma_separated_integers('day5input.txt'))
 
     def run(self, system_id):
-        self.ic.start()
-        self.ic.write_input(system_id)
-
-        while not self.ic.finished:
-            yield self.ic.read_output()
+        outputs = []
+        self.ic.run(partial(next, iter([system_id]), None), outputs.append)
+        assert self.ic.finished
+        return outputs
 
 
 def puzzle1():
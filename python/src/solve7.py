@@ -1,44 +1,93 @@
+from functools import partial
 from itertools import permutations
 
-from intcode import Intcode
+from intcode import IntcodePrototype
+from intcode_pipeline import IntcodePipeline
+from intcode_pool import IntcodePool
 from input_reader import read_comma_separated_integers
 
 
+def get_amplification_circuit_thruster_value(ic, phase_settings):
+    pipeline = IntcodePipeline()
+    for i, phase_setting in enumerate(phase_settings):
+        pipeline.add(i, ic.fork(), [phase_setting])
+        if i > 0:
+            pipeline.connect(i - 1, i)
+    last = len(phase_settings) - 1
+    pipeline.connect(last, 0)
+    pipeline.inputs(0).append(0)
+
+    pipeline.run()
+    assert pipeline.finished
+    # the last output of the last amplifier, never read by the first one
+    return pipeline.inputs(0)[-1]
+
+
+def find_max_thrust(phase_settings_pool):
+    opcodes = read_comma_separated_integers('day7input.txt')
+    with IntcodePool(opcodes, chunk_size=8) as pool:
+        return max(pool.imap(get_amplification_circuit_thruster_value,
+                             permutations(phase_settings_pool)))
+
+
 class Amplifier:
-    def __init__(self, phase_setting):
-        self.ic = Intcode(read_comma_separated_integers('day7input.txt'))
-        self.ic.start()
-        self.ic.write_input(phase_setting)
+    """One amplifier of a feed-forward chain, remembering its results."""
+    def __init__(self):
+        self.prototype = IntcodePrototype(
+            read_comma_separated_integers('day7input.txt'))
+        self.cache = {}
 
-    def run(self, input_value):
-        self.ic.write_input(input_value)
-        return self.ic.read_output()
+    def amplify(self, signal, phase_setting):
+        key = signal, phase_setting
+        if key not in self.cache:
+            outputs = []
+            ic = self.prototype.instantiate()
+            ic.run(partial(next, iter([phase_setting, signal]), None),
+                   outputs.append)
+            self.cache[key] = outputs[-1]
+        return self.cache[key]
 
-    @property
-    def finished(self):
-        return self.ic.finished
 
+def find_best_ordering(phase_settings_pool, step, signal, upper_bound=None):
+    """Find the ordering of phase settings giving the highest final signal.
 
-def get_amplification_circuit_thruster_value(phase_settings):
-    amplifiers = [Amplifier(phase_setting) for phase_setting in phase_settings]
-    value = 0
-    thruster_value = None
-    while True:
-        for amplifier in amplifiers:
-            value = amplifier.run(value)
-        thruster_value = value
-        if amplifier.finished:
-            return thruster_value
+    step(signal, phase_setting) returns the signal after one more stage.
+    The orderings are searched depth-first as a trie of prefixes, so the
+    signal after each distinct prefix is computed once. If given,
+    upper_bound(signal, remaining_phase_settings) must never be lower than
+    the best final signal reachable from a prefix, and prefixes which cannot
+    beat the best ordering found so far are skipped.
 
+    Returns a tuple (signal, ordering).
+    """
+    best = None, None
 
-def find_max_thrust(phase_settings_pool):
-    return max(
-        get_amplification_circuit_thruster_value(phase_settings)
-        for phase_settings in permutations(phase_settings_pool))
+    def search(prefix, signal, remaining):
+        nonlocal best
+        if not remaining:
+            if best[0] is None or signal > best[0]:
+                best = signal, prefix
+            return
+        if (upper_bound is not None and best[0] is not None
+                and upper_bound(signal, remaining) <= best[0]):
+            return
+        for i, phase_setting in enumerate(remaining):
+            search(prefix + (phase_setting,), step(signal, phase_setting),
+                   remaining[:i] + remaining[i + 1:])
+
+    search((), signal, tuple(phase_settings_pool))
+    return best
+
+
+def find_max_feed_forward_thrust(phase_settings_pool):
+    amplifier = Amplifier()
+    thrust, _ordering = find_best_ordering(
+        phase_settings_pool, amplifier.amplify, 0)
+    return thrust
 
 
 def puzzle1():
-    return find_max_thrust([0,1,2,3,4])
+    return find_max_feed_forward_thrust([0,1,2,3,4])
 
 
 def puzzle2():
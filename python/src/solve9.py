@@ -1,10 +1,10 @@
-from intcode import Intcode
+from intcode_compiler import CompiledIntcode
 from input_reader import read_comma_separated_integers
 
 
 class BoostProgram:
     def __init__(self):
-        self.ic = Intcode(read_comma_separated_integers('day9input.txt'))
+        self.ic = CompiledIntcode(read_comma_separated_integers('day9input.txt'))
 
     def _read_all(self):
         while not self.ic.finished:
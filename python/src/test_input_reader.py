@@ -0,0 +1,115 @@
+import os
+import pathlib
+import tempfile
+
+import input_reader
+from input_reader import (
+    read_grid, read_asteroid_map, read_bugs_coordinates, read_integer_array,
+    read_digit_array, read_comma_separated_integers)
+
+
+def _input(text):
+    # not imported by name, pytest would take TestInput for a test class
+    return input_reader.TestInput(text)
+
+
+def _rows(text):
+    return [bytes(row).decode() for row in read_grid(_input(text))]
+
+
+def test_read_grid_line_ends():
+    assert _rows('ab\ncd') == ['ab', 'cd']
+    assert _rows('ab\ncd\n') == ['ab', 'cd']
+    assert _rows('ab\r\ncd\r\n') == ['ab', 'cd']
+    assert _rows('ab\r\ncd') == ['ab', 'cd']
+    assert _rows('#.\r\n.#\n') == ['#.', '.#']
+    assert _rows('') == []
+
+
+def test_read_grid_pads_short_lines():
+    assert _rows('a\nbcd\n') == ['a  ', 'bcd']
+    assert _rows('ab\n\ncd\n') == ['ab', '  ', 'cd']
+
+
+def test_map_readers_without_final_newline():
+    assert list(read_asteroid_map(_input('.#\n#.'))) == [(1, 0), (0, 1)]
+    assert read_bugs_coordinates(_input('#.\r\n.#')) == {(0, 0), (1, 1)}
+
+
+def test_read_digit_array_line_ends():
+    for text in ('0123\n', '0123\r\n', '0123\r\n4\r\n', '0123'):
+        assert read_digit_array(_input(text)).tolist() == [0, 1, 2, 3]
+
+
+def test_read_integer_array():
+    assert read_integer_array('day2input.txt').tolist() == list(
+        read_comma_separated_integers('day2input.txt'))
+    limit = 2 ** 63 - 1
+    assert read_integer_array(_input(f'1,-2,{limit},{-limit - 1}\n')
+                              ).tolist() == [1, -2, limit, -limit - 1]
+    for text in (f'1,{limit + 1}', f'{-limit - 2},1'):
+        try:
+            read_integer_array(_input(text))
+        except ValueError:
+            continue
+        assert False, f'{text} did not raise ValueError'
+
+
+def test_cached_reader_rereads_modified_files():
+    input_path = input_reader._input_path
+    with tempfile.TemporaryDirectory() as directory:
+        path = pathlib.Path(directory) / 'numbers.txt'
+        input_reader._input_path = lambda filename: path.with_name(filename)
+        try:
+            path.write_text('1,2\n')
+            os.utime(path, ns=(10 ** 18, 10 ** 18))
+            assert read_comma_separated_integers('numbers.txt') == (1, 2)
+            # unchanged modification time, the cached result is returned
+            path.write_text('3\n')
+            os.utime(path, ns=(10 ** 18, 10 ** 18))
+            assert read_comma_separated_integers('numbers.txt') == (1, 2)
+            os.utime(path, ns=(10 ** 18 + 1, 10 ** 18 + 1))
+            assert read_comma_separated_integers('numbers.txt') == (3,)
+        finally:
+            input_reader._input_path = input_path
+            input_reader._cache.pop(
+                ('read_comma_separated_integers', 'numbers.txt'), None)
+
+
+def test_cached_reader_skips_test_inputs():
+    cache_size = len(input_reader._cache)
+    assert read_comma_separated_integers(_input('1,2')) == (1, 2)
+    assert read_comma_separated_integers(_input('3')) == (3,)
+    assert len(input_reader._cache) == cache_size
+
+
+@input_reader.cached_on_disk
+def _line_length(filename, factor):
+    return len(input_reader.read_one_line(filename)) * factor
+
+
+def test_cached_on_disk_keeps_latest_entries():
+    cache_directory = input_reader.CACHE_DIRECTORY
+    with tempfile.TemporaryDirectory() as directory:
+        input_reader.CACHE_DIRECTORY = pathlib.Path(directory)
+        try:
+            assert _line_length('day1input.txt', 1) > 0
+            entry, = input_reader.CACHE_DIRECTORY.iterdir()
+            assert _line_length('day1input.txt', 2) == _line_length(
+                'day1input.txt', 1) * 2
+            entries = sorted(input_reader.CACHE_DIRECTORY.iterdir())
+            assert len(entries) == 2
+            # as if written by an older version of the code
+            entry.rename(entry.with_name(
+                entry.name.rsplit('-', 1)[0] + '-0.marshal'))
+            _line_length('day1input.txt', 1)
+            assert sorted(input_reader.CACHE_DIRECTORY.iterdir()) == entries
+        finally:
+            input_reader.CACHE_DIRECTORY = cache_directory
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+    print('OK.')
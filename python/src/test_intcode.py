@@ -0,0 +1,324 @@
+import asyncio
+import os
+import random
+import tempfile
+from functools import partial
+from itertools import count
+
+from input_reader import read_comma_separated_integers
+from intcode import Intcode, IntcodePrototype, IntcodeError
+from intcode_ascii import AsciiIntcode
+from intcode_async import AsyncIntcode
+from intcode_batch import IntcodeBatch
+from intcode_compiler import CompiledIntcode
+from intcode_pool import IntcodePool
+from intcode_scheduler import IntcodeScheduler
+from solve7 import get_amplification_circuit_thruster_value
+
+
+# no program writes below this address, so code is never modified
+IMAGE_LIMIT = 200
+MAX_ADDRESS = 3000
+
+
+def _random_parameter(rng, written=False):
+    mode = rng.choice((0, 2) if written else (0, 1, 2))
+    if mode == 0:
+        low = IMAGE_LIMIT if written else 0
+        return mode, rng.randrange(low, MAX_ADDRESS)
+    if mode == 1:
+        return mode, rng.randrange(-9, 10)
+    # the relative base is at least IMAGE_LIMIT
+    return mode, rng.randrange(0, MAX_ADDRESS)
+
+
+def _random_instruction(rng):
+    op = rng.choice((1, 2, 3, 4, 7, 8, 9))
+    if op in (1, 2, 7, 8):
+        parameters = [_random_parameter(rng), _random_parameter(rng),
+                      _random_parameter(rng, written=True)]
+    elif op == 3:
+        parameters = [_random_parameter(rng, written=True)]
+    elif op == 4:
+        parameters = [_random_parameter(rng)]
+    else:
+        parameters = [(1, rng.randrange(0, 500))]
+    word = op + sum(mode * 10 ** (i + 2)
+                    for i, (mode, _arg) in enumerate(parameters))
+    return [word] + [arg for _mode, arg in parameters]
+
+
+def _random_program(rng):
+    program = [109, rng.randrange(IMAGE_LIMIT, 2 * IMAGE_LIMIT)]
+    for _i in range(rng.randrange(1, 20)):
+        program += _random_instruction(rng)
+        if rng.random() < 0.02:
+            # the only jumps, as they cannot loop
+            program += rng.choice(([1105, 1], [1106, 0])) + [rng.randrange(-9, 0)]
+    return program + [99]
+
+
+def _self_modifying_program(rng):
+    """A loop running random instructions, which patch the loop's code."""
+    instructions = []
+    for _i in range(rng.randrange(1, 8)):
+        instruction = _random_instruction(rng)
+        # the relative base stays fixed, so relative patches hit their target
+        if instruction[0] % 100 != 9:
+            instructions.append(instruction)
+        if rng.random() < 0.5:
+            instructions.append(None)
+    # each patch is one instruction of 4 cells
+    body_end = 2 + sum(4 if i is None else len(i) for i in instructions)
+    counter = body_end + 8
+    relative_base = rng.randrange(IMAGE_LIMIT, 2 * IMAGE_LIMIT)
+    program = [109, relative_base]
+    for instruction in instructions:
+        if instruction is None:
+            target = rng.randrange(2, body_end)
+            value = rng.choice((1, 2, 4, 7, 8, 99, 101, 104, 1001, 1101,
+                                2101, 0, -1, 3, 9))
+            if rng.random() < 0.5:
+                instruction = [1101, value, 0, target]
+            else:
+                instruction = [21101, value, 0, target - relative_base]
+        program += instruction
+    program += [1001, counter, -1, counter, 1005, counter, 2, 99, 3]
+    return program
+
+
+def _run_until_error(ic, inputs):
+    """Run ic, return its outputs and the type of the exception raised."""
+    outputs = []
+    try:
+        ic.run(partial(next, iter(inputs), None), outputs.append)
+    except (IntcodeError, IndexError) as e:
+        return outputs, type(e)
+    return outputs, None
+
+
+def _no_input():
+    return None
+
+
+def _run_intcode(program, inputs):
+    ic = Intcode(program)
+    outputs = []
+    ic.run(partial(next, iter(inputs), None), outputs.append)
+    assert ic.finished
+    return ic, outputs
+
+
+def test_memory_is_sparse():
+    ic, outputs = _run_intcode([109, 10 ** 8, 21101, 1, 2, 0, 204, 0, 99], [])
+    assert outputs == [3]
+    # the image and the written page only
+    assert len(ic.memory._pages) == 2
+
+    fork = ic.fork()
+    fork.memory[10 ** 8] = 4
+    assert ic.memory[10 ** 8] == 3
+    assert fork.memory[10 ** 8 + 1] == 0
+
+
+def test_forks_share_decoded_code_until_written():
+    # writes 42 into the parameter of the output instruction, then outputs it
+    prototype = IntcodePrototype([1101, 40, 2, 5, 104, 0, 99])
+    for _i in range(2):
+        ic = prototype.instantiate()
+        outputs = []
+        ic.run(_no_input, outputs.append)
+        assert outputs == [42]
+    assert prototype.instantiate().memory[5] == 0
+
+    ic = IntcodePrototype([104, 7, 99]).instantiate()
+    fork = ic.fork()
+    fork.memory[1] = 8
+    for machine, expected in ((ic, [7]), (fork, [8]), (ic.fork(), [7])):
+        outputs = []
+        machine.run(_no_input, outputs.append)
+        assert outputs == expected
+
+
+def test_compiled_matches_intcode_on_self_modifying_code():
+    # jumps to -3, whose parameter at -2 looks written by the program
+    program = [1105, 1, -3, 99, 1101, 1, 1, -2, 104, 0, 99]
+    assert (_run_until_error(CompiledIntcode(program), []) ==
+            _run_until_error(Intcode(program), []) == ([], IndexError))
+
+    rng = random.Random(2019)
+    for _i in range(300):
+        program = _self_modifying_program(rng)
+        inputs = [rng.randrange(-100, 100) for _j in range(50)]
+        reference = Intcode(program)
+        try:
+            reference.run(partial(next, iter(inputs), None), lambda v: None,
+                          max_instructions=10000)
+        except (IntcodeError, IndexError):
+            pass
+        if reference.suspended:
+            # patched into a long loop
+            continue
+        reference = Intcode(program)
+        compiled = CompiledIntcode(program)
+        assert (_run_until_error(compiled, inputs) ==
+                _run_until_error(reference, inputs)), program
+        assert compiled.memory == reference.memory, program
+
+
+def test_snapshot_resumes_day25_session():
+    opcodes = read_comma_separated_integers('day25input.txt')
+    for cls in (Intcode, CompiledIntcode):
+        droid = AsciiIntcode(cls(opcodes))
+        droid.read()
+        droid.write_line('north')
+        droid.read()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'droid.snapshot')
+            droid.ic.save(path)
+            restored = AsciiIntcode(cls.load(path))
+        for command in ('inv', 'south', 'west'):
+            droid.write_line(command)
+            restored.write_line(command)
+            assert droid.read() == restored.read()
+
+
+def test_compiled_snapshot_restores_zero_pages():
+    program = [3, 2000, 4, 1500, 99] + [0] * 2100
+    program[-1] = 5
+    for cls in (Intcode, CompiledIntcode):
+        ic = cls(program)
+        ic.start()
+        restored = cls.from_snapshot(ic.snapshot())
+        restored.write_input(1)
+        assert restored.read_output() == 0
+
+
+def test_snapshot_of_other_class_is_rejected():
+    ic = Intcode([3, 0, 99])
+    ic.start()
+    compiled = CompiledIntcode([3, 0, 99])
+    compiled.start()
+    for cls, data in ((Intcode, compiled.snapshot()),
+                      (CompiledIntcode, ic.snapshot()),
+                      (Intcode, b'not a snapshot')):
+        try:
+            cls.from_snapshot(data)
+        except IntcodeError:
+            continue
+        assert False, f'{cls.__name__} loaded a wrong snapshot'
+
+
+async def _run_feedback_loop(ic, phase_settings):
+    # channels[i] is the input of amplifier i, the last one feeds the first
+    channels = [asyncio.Queue() for _phase_setting in phase_settings]
+    for channel, phase_setting in zip(channels, phase_settings):
+        channel.put_nowait(phase_setting)
+    channels[0].put_nowait(0)
+
+    amplifiers = [
+        AsyncIntcode(ic.fork(), channel, channels[(i + 1) % len(channels)])
+        for i, channel in enumerate(channels)]
+    await asyncio.gather(*(amplifier.run() for amplifier in amplifiers))
+    return channels[0].get_nowait()
+
+
+def test_async_feedback_loop():
+    # the example of day 7, part 2
+    ic = Intcode([3, 26, 1001, 26, -4, 26, 3, 27, 1002, 27, 2, 27, 1, 27, 26,
+                  27, 4, 27, 1001, 28, -1, 28, 1005, 28, 6, 99, 0, 0, 5])
+    assert asyncio.run(_run_feedback_loop(ic, [9, 8, 7, 6, 5])) == 139629729
+
+    ic = Intcode(read_comma_separated_integers('day7input.txt'))
+    phase_settings = [7, 5, 9, 6, 8]
+    assert (asyncio.run(_run_feedback_loop(ic, phase_settings)) ==
+            get_amplification_circuit_thruster_value(ic, phase_settings))
+
+
+def _day2_result_matches(ic, noun_verb):
+    ic.memory[1], ic.memory[2] = noun_verb
+    ic.start()
+    return ic.memory[0] == 19690720 or None
+
+
+def test_pool_first_takes_jobs_lazily():
+    opcodes = read_comma_separated_integers('day2input.txt')
+    # endless, nouns and verbs are below 100 though
+    jobs = (divmod(i, 100) for i in count())
+    with IntcodePool(opcodes, processes=2) as pool:
+        assert pool.first(_day2_result_matches, jobs) == ((39, 51), True)
+        assert pool.first(_day2_result_matches, [(0, 0), (1, 1)]) is None
+
+
+def _scheduled_outputs(priority):
+    outputs = []
+    scheduler = IntcodeScheduler(quantum=1, priority=priority)
+    for value in (1, 2, 3):
+        scheduler.add(Intcode([104, value, 104, value, 99]), _no_input,
+                      outputs.append)
+    scheduler.run()
+    return outputs
+
+
+def test_scheduler_priority():
+    assert _scheduled_outputs(None) == [1, 2, 3, 1, 2, 3]
+    assert _scheduled_outputs(lambda task: 0) == [1, 2, 3, 1, 2, 3]
+    assert _scheduled_outputs(
+        lambda task: task.ic.memory[1]) == [3, 3, 2, 2, 1, 1]
+    # consulted for each slice, so a task which has run keeps running
+    assert _scheduled_outputs(
+        lambda task: task.instructions) == [1, 1, 2, 2, 3, 3]
+
+
+def test_batch_relative_access_beyond_image():
+    batch = IntcodeBatch([109, 1000, 204, 5, 99], inputs=[[]])
+    batch.run()
+    assert batch.outputs == [[0]]
+
+    batch = IntcodeBatch([109, 1000, 21101, 3, 4, 5, 204, 5, 99], inputs=[[]])
+    batch.run()
+    assert batch.outputs == [[7]]
+
+
+def test_batch_matches_intcode():
+    rng = random.Random(2019)
+    for _i in range(300):
+        program = _random_program(rng)
+        inputs = [[rng.randrange(-100, 100) for _j in range(len(program))]
+                  for _k in range(3)]
+        references = []
+        error = None
+        for values in inputs:
+            ic = Intcode(program)
+            outputs = []
+            try:
+                ic.run(partial(next, iter(values), None), outputs.append)
+            except IndexError as e:
+                error = type(e)
+            references.append((ic, outputs))
+
+        batch = IntcodeBatch(program, inputs=inputs)
+        if any(abs(ic.memory[a]) >= 2 ** 63
+               for ic, _outputs in references for a in range(MAX_ADDRESS * 2)):
+            error = OverflowError
+        if error is not None:
+            try:
+                batch.run()
+            except error:
+                continue
+            assert False, f'no {error.__name__} for {program}'
+        batch.run()
+
+        assert batch.finished.all()
+        for i, (ic, outputs) in enumerate(references):
+            assert batch.outputs[i] == outputs, program
+            assert batch.memory[i].tolist() == [
+                ic.memory[a] for a in range(batch.memory.shape[1])], program
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+    print('OK.')